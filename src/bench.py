@@ -0,0 +1,309 @@
+import asyncio
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pandas as pd
+from dotenv import load_dotenv
+
+import main
+from fake_db import FakePool
+from fake_telegram import FakeTelegramClient, SyntheticForum
+from reports import build_yesterday_report_parquet
+from storage import dataset_path
+from threads import THREAD_INPUT_COLS
+from utils_time import jakarta_bounds_yesterday_utc, yday_label_str
+
+# ====== CONFIG ======
+load_dotenv()
+# synthetic forum: topics, messages in yesterday's window, distinct senders
+BENCH_TOPICS = int(os.getenv("BENCH_TOPICS", "40"))
+BENCH_MESSAGES = int(os.getenv("BENCH_MESSAGES", "100000"))
+BENCH_SENDERS = int(os.getenv("BENCH_SENDERS", "2000"))
+# "zipf" (a few very active senders) or "uniform"
+BENCH_SENDER_DIST = os.getenv("BENCH_SENDER_DIST", "zipf")
+# topics with no message in the window (skipped by the harvest)
+BENCH_DORMANT_TOPICS = int(os.getenv("BENCH_DORMANT_TOPICS", "5"))
+BENCH_SEED = int(os.getenv("BENCH_SEED", "1"))
+
+# simulated Telegram round trip, and a FloodWait every N RPCs (0 = never)
+BENCH_LATENCY_MS = float(os.getenv("BENCH_LATENCY_MS", "0"))
+BENCH_FLOOD_EVERY = int(os.getenv("BENCH_FLOOD_EVERY", "0"))
+BENCH_FLOOD_SECONDS = int(os.getenv("BENCH_FLOOD_SECONDS", "1"))
+# limiter rate for the run: high, so the code (not the limiter) is measured
+BENCH_TG_RPS = float(os.getenv("BENCH_TG_RPS", "1000"))
+
+# simulated MySQL round trip per statement, and the load methods to time
+BENCH_DB_LATENCY_MS = float(os.getenv("BENCH_DB_LATENCY_MS", "0"))
+BENCH_LOAD_METHODS = [
+    m.strip()
+    for m in os.getenv("BENCH_LOAD_METHODS", "executemany,load_data").split(",")
+    if m.strip()
+]
+
+# report builds per run (best time is kept)
+BENCH_REPEAT = max(1, int(os.getenv("BENCH_REPEAT", "3")))
+
+# results history (one JSON object per run) and allowed slowdown vs the
+# previous run with the same parameters before it counts as a regression
+BENCH_RESULTS = Path(os.getenv("BENCH_RESULTS", "bench_results.jsonl"))
+BENCH_TOLERANCE = float(os.getenv("BENCH_TOLERANCE", "0.2"))
+# ====================
+
+# cli.py subcommands whose startup (fresh interpreter + imports) is timed
+BENCH_STARTUP = [
+    c.strip()
+    for c in os.getenv(
+        "BENCH_STARTUP", "harvest,report,load,member-count,backfill"
+    ).split(",")
+    if c.strip()
+]
+
+
+def _params() -> dict:
+    return {
+        "topics": BENCH_TOPICS,
+        "messages": BENCH_MESSAGES,
+        "senders": BENCH_SENDERS,
+        "sender_dist": BENCH_SENDER_DIST,
+        "dormant_topics": BENCH_DORMANT_TOPICS,
+        "seed": BENCH_SEED,
+        "latency_ms": BENCH_LATENCY_MS,
+        "flood_every": BENCH_FLOOD_EVERY,
+        "db_latency_ms": BENCH_DB_LATENCY_MS,
+        "layout": main.OUT_LAYOUT,
+        "compact": main.PARQUET_COMPACT,
+        "topic_concurrency": main.TOPIC_CONCURRENCY,
+        "load_streams": main.MYSQL_LOAD_STREAMS,
+    }
+
+
+def _git_revision() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=Path(__file__).parent,
+        )
+    except OSError:
+        return None
+    return out.stdout.strip() or None
+
+
+def _point_main_at(work_dir: Path, client, pool) -> None:
+    """
+    Run main's real code paths offline: fake client and pool, outputs in
+    work_dir, limiter rate high enough to measure the code.
+    """
+    main.OUT_DIR = work_dir
+    main.SENDER_CACHE_PATH = work_dir / "sender_cache.sqlite"
+    main.HWM_STATE_PATH = work_dir / "harvest_state.json"
+    main._telegram_client = lambda: client
+    main._mysql_pool = lambda pool_size: pool
+    main.TG_RPS = main.TG_MAX_RPS = BENCH_TG_RPS
+    main.TG_BURST = max(main.TG_BURST, int(BENCH_TG_RPS))
+
+
+async def bench_harvest(client) -> dict:
+    """
+    Daily run against the fake client. The report / member count step is
+    timed on its own (outputs_s), so harvest_s is the scraping part.
+    """
+    save_outputs, outputs_s = main._save_daily_outputs, [0.0]
+
+    async def _timed_outputs(*args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            await save_outputs(*args, **kwargs)
+        finally:
+            outputs_s[0] += time.perf_counter() - t0
+
+    main._save_daily_outputs = _timed_outputs
+    try:
+        t0 = time.perf_counter()
+        await main.dump_yesterday_messages_and_member()
+        total_s = time.perf_counter() - t0
+    finally:
+        main._save_daily_outputs = save_outputs
+    harvest_s = total_s - outputs_s[0]
+    return {
+        "harvest_s": round(harvest_s, 3),
+        "outputs_s": round(outputs_s[0], 3),
+        "rpc_calls": client.rpc_calls,
+        "flood_waits": client.flood_waits,
+    }
+
+
+def bench_report(messages_path: Path, now_utc: datetime, work_dir: Path) -> float:
+    """
+    Best-of-BENCH_REPEAT daily report build, reading the parquet like
+    main._save_reports does. Return: seconds
+    """
+    best = None
+    for _ in range(BENCH_REPEAT):
+        t0 = time.perf_counter()
+        df = pd.read_parquet(
+            messages_path,
+            columns=main.REPORT_INPUT_COLS + THREAD_INPUT_COLS,
+            read_dictionary=["topic_title", "sender_username"],
+        )
+        build_yesterday_report_parquet(
+            df, work_dir, now_utc, out_path=work_dir / "bench_report.parquet"
+        )
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def bench_startup(subcommand: str, work_dir: Path) -> float:
+    """
+    Best-of-BENCH_REPEAT wall time of `cli.py <subcommand> --import-only`
+    in a fresh interpreter (interpreter start + the subcommand's imports).
+    Return: seconds
+    """
+    cmd = [sys.executable, str(Path(__file__).with_name("cli.py")), subcommand]
+    env = dict(os.environ, OUT_DIR=str(work_dir), BACKFILL_FROM="2000-01-01")
+    best = None
+    for _ in range(BENCH_REPEAT):
+        t0 = time.perf_counter()
+        subprocess.run(
+            cmd + ["--import-only"], env=env, capture_output=True, check=True
+        )
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+async def bench_load(yday_str: str, method: str) -> dict:
+    """
+    main's MySQL load of the day's parquets into a fresh FakePool.
+    """
+    pool = FakePool(latency_s=BENCH_DB_LATENCY_MS / 1000)
+    main._mysql_pool = lambda pool_size: pool
+    main.MYSQL_LOAD_METHOD = method
+    t0 = time.perf_counter()
+    await main.load_day_parquets_into_mysql(yday_str)
+    elapsed = time.perf_counter() - t0
+    return {"rows": pool.rows["telegram_messages_yday"], "s": elapsed}
+
+
+def compare(result: dict, history: list[dict]) -> list[str]:
+    """
+    Metrics worse than the last run with the same parameters by more than
+    BENCH_TOLERANCE: *_per_s are rates, other *_s are durations.
+    Return: one line per regression
+    """
+    previous = [r for r in history if r.get("params") == result["params"]]
+    if not previous:
+        return []
+    before, now = previous[-1]["metrics"], result["metrics"]
+    regressions = []
+    for name, value in now.items():
+        old = before.get(name)
+        if not old or not isinstance(value, (int, float)) or name == "rows":
+            continue
+        if name.endswith("_per_s"):
+            change = old / value - 1 if value else float("inf")
+        elif name.endswith("_s"):
+            change = value / old - 1
+        else:
+            continue
+        if change > BENCH_TOLERANCE:
+            regressions.append(
+                f"{name}: {old} -> {value} ({change:+.0%} worse, "
+                f"vs {previous[-1].get('git') or '?'})"
+            )
+    return regressions
+
+
+def _read_history(path: Path) -> list[dict]:
+    if not path.exists():
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+async def run() -> dict:
+    now_utc = datetime.now(timezone.utc)
+    start_utc, end_utc = jakarta_bounds_yesterday_utc(now_utc)
+    # a few hours on both sides, so the window edges are exercised
+    span = end_utc - start_utc + timedelta(hours=6)
+    forum = SyntheticForum(
+        start_utc - timedelta(hours=3),
+        end_utc + timedelta(hours=3),
+        topics=BENCH_TOPICS,
+        messages=int(BENCH_MESSAGES * span / (end_utc - start_utc)),
+        senders=BENCH_SENDERS,
+        sender_dist=BENCH_SENDER_DIST,
+        dormant_topics=BENCH_DORMANT_TOPICS,
+        seed=BENCH_SEED,
+    )
+    client = FakeTelegramClient(
+        forum,
+        latency_s=BENCH_LATENCY_MS / 1000,
+        flood_every=BENCH_FLOOD_EVERY,
+        flood_seconds=BENCH_FLOOD_SECONDS,
+    )
+    work_dir = Path(tempfile.mkdtemp(prefix="telegram_bench_"))
+    try:
+        _point_main_at(work_dir, client, FakePool())
+        metrics = await bench_harvest(client)
+
+        yday_str = yday_label_str(now_utc)
+        messages_path = dataset_path(work_dir, "all_topics", yday_str, main.OUT_LAYOUT)
+        rows = pd.read_parquet(messages_path, columns=["message_id"]).shape[0]
+        metrics["rows"] = rows
+        metrics["harvest_msgs_per_s"] = round(rows / metrics["harvest_s"])
+
+        report_s = bench_report(messages_path, now_utc, work_dir)
+        metrics["report_s"] = round(report_s, 3)
+        metrics["report_msgs_per_s"] = round(rows / report_s)
+
+        for method in BENCH_LOAD_METHODS:
+            load = await bench_load(yday_str, method)
+            if load["rows"] != rows:
+                print(f"[!] {method}: loaded {load['rows']} of {rows} rows")
+            metrics[f"load_{method}_rows_per_s"] = round(load["rows"] / load["s"])
+
+        for subcommand in BENCH_STARTUP:
+            startup_s = bench_startup(subcommand, work_dir)
+            metrics[f"startup_{subcommand.replace('-', '_')}_s"] = round(startup_s, 3)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        "at_utc": now_utc.isoformat(),
+        "git": _git_revision(),
+        "python": sys.version.split()[0],
+        "params": _params(),
+        "metrics": metrics,
+    }
+
+
+def main_bench():
+    result = asyncio.run(run())
+    for name, value in result["metrics"].items():
+        print(f"[i] {name}: {value}")
+
+    history = _read_history(BENCH_RESULTS)
+    regressions = compare(result, history)
+    BENCH_RESULTS.parent.mkdir(parents=True, exist_ok=True)
+    with open(BENCH_RESULTS, "a", encoding="utf-8") as f:
+        f.write(json.dumps(result) + "\n")
+    print(f"[✓] Saved bench result: {BENCH_RESULTS}")
+
+    for line in regressions:
+        print(f"[!] Regression {line}")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_bench()
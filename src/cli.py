@@ -0,0 +1,145 @@
+import time
+
+# startup clock, started before any other import
+_T0 = time.perf_counter()
+
+import argparse
+import asyncio
+import importlib
+import os
+import sys
+from datetime import date, datetime, timedelta, timezone
+
+from dotenv import load_dotenv
+
+# modules each subcommand needs, imported when it runs (not at cli import),
+# so e.g. "load" never pays for Telethon and "report" for neither Telethon
+# nor mysql-connector; --import-only stops after these imports
+SUBCOMMAND_IMPORTS = {
+    "harvest": ("main", "telethon", "topics", "members", "ratelimit", "db", "pipeline"),
+    "report": ("main",),
+    "load": ("main", "db"),
+    "member-count": ("main", "telethon", "members", "ratelimit"),
+    "backfill": ("main", "telethon", "topics", "ratelimit", "db"),
+}
+
+
+def _jakarta_yesterday() -> date:
+    return (datetime.now(timezone.utc) + timedelta(hours=7)).date() - timedelta(days=1)
+
+
+def _day(value: str) -> date:
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not a YYYY-MM-DD day: {value!r}")
+
+
+def _import(subcommand: str) -> float:
+    """
+    Import the subcommand's modules.
+    Return: seconds since cli.py started (its startup time)
+    """
+    for name in SUBCOMMAND_IMPORTS[subcommand]:
+        importlib.import_module(name)
+    return time.perf_counter() - _T0
+
+
+def _harvest(main, args, startup_s: float) -> None:
+    main.run_job(
+        main.harvest_and_load(args.mode, load=not args.no_load), args.mode, startup_s
+    )
+
+
+def _report(main, args, startup_s: float) -> None:
+    main.run_job(asyncio.to_thread(main.rebuild_reports, args.day), "report", startup_s)
+
+
+def _load(main, args, startup_s: float) -> None:
+    async def _run():
+        results = await main.load_day_parquets_into_mysql(args.day.strftime("%Y%m%d"))
+        print(f"[✓] MySQL load results {args.day.isoformat()}: {results}")
+
+    main.run_job(_run(), "load", startup_s)
+
+
+def _member_count(main, args, startup_s: float) -> None:
+    main.run_job(main.dump_member_count(), "member_count", startup_s)
+
+
+def _backfill(main, args, startup_s: float) -> None:
+    main.run_job(
+        main.backfill_and_load(args.first, args.last or args.first),
+        "backfill",
+        startup_s,
+    )
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="cli.py",
+        description="Telegram forum scraper. Settings come from the environment "
+        "(.env), as for main.py; options override them for one run.",
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def _add(name: str, handler, help_: str) -> argparse.ArgumentParser:
+        p = sub.add_parser(name, help=help_, description=help_)
+        p.add_argument(
+            "--import-only",
+            action="store_true",
+            help="import what the subcommand needs, print the startup time and exit",
+        )
+        p.set_defaults(handler=handler)
+        return p
+
+    default_mode = os.getenv("HARVEST_MODE", "daily")
+    if default_mode == "daily" and os.getenv("PIPELINE_MODE", "0") == "1":
+        default_mode = "pipeline"
+    p = _add("harvest", _harvest, "harvest yesterday, build its outputs, load MySQL")
+    p.add_argument(
+        "--mode",
+        choices=("daily", "incremental", "pipeline"),
+        default=default_mode if default_mode != "backfill" else "daily",
+    )
+    p.add_argument("--no-load", action="store_true", help="skip the MySQL load")
+
+    p = _add("report", _report, "rebuild a day's reports from its messages parquet")
+    p.add_argument("--day", type=_day, default=_jakarta_yesterday(), help="YYYY-MM-DD")
+
+    p = _add("load", _load, "load a day's parquet files into MySQL")
+    p.add_argument("--day", type=_day, default=_jakarta_yesterday(), help="YYYY-MM-DD")
+
+    _add("member-count", _member_count, "write only the member count parquet")
+
+    p = _add("backfill", _backfill, "harvest and load a range of past days")
+    p.add_argument(
+        "--from",
+        dest="first",
+        type=_day,
+        default=os.getenv("BACKFILL_FROM") or None,
+        required=not os.getenv("BACKFILL_FROM"),
+        help="first day, YYYY-MM-DD (BACKFILL_FROM)",
+    )
+    p.add_argument(
+        "--to",
+        dest="last",
+        type=_day,
+        default=os.getenv("BACKFILL_TO") or None,
+        help="last day, YYYY-MM-DD (BACKFILL_TO, default: --from)",
+    )
+    return parser
+
+
+def main(argv=None) -> None:
+    load_dotenv()
+    args = build_parser().parse_args(argv)
+    startup_s = _import(args.command)
+    if args.import_only:
+        print(f"[i] {args.command} startup: {startup_s:.3f}s")
+        return
+    args.handler(sys.modules["main"], args, startup_s)
+
+
+if __name__ == "__main__":
+    main()
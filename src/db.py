@@ -1,11 +1,20 @@
 # db.py
 from __future__ import annotations
 import os
+import queue
 import re
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
 from typing import Optional, Iterable, List, Tuple
 import pandas as pd
+import pyarrow.parquet as pq
 import mysql.connector
-from mysql.connector import Error
+from mysql.connector import Error, pooling
+
+import metrics
+from parquet_sink import INT64_NULLABLE
 
 
 # -------- Connection --------
@@ -15,9 +24,12 @@ def get_conn(
     mysql_password: str,
     mysql_database: str,
     mysql_port: int = 3306,
+    allow_local_infile: bool = False,
 ):
     """
     Create a mysql-connector connection (utf8mb4).
+    allow_local_infile is needed for the LOAD DATA LOCAL INFILE load method
+    (the server must also run with local_infile=ON).
     Requires: pip install mysql-connector-python
     """
     conn = mysql.connector.connect(
@@ -29,6 +41,7 @@ def get_conn(
         charset="utf8mb4",
         use_unicode=True,
         autocommit=True,
+        allow_local_infile=allow_local_infile,
     )
     return conn
 
@@ -37,59 +50,440 @@ get_engine = get_conn
 
 
 # -------- Schema / Tables --------
-def ensure_tables_exist(conn):
-    """
-    Create tables if not exists using mysql-connector (no SQLAlchemy).
-    """
-    ddl_messages = """
-    CREATE TABLE IF NOT EXISTS telegram_messages_yday (
+# natural key of each table; loads upsert on it so reruns of a day are idempotent
+# (chat_id is 0 on rows loaded before multi-chat support)
+TABLE_KEYS = {
+    "telegram_messages_yday": ["chat_id", "topic_id", "message_id"],
+    "telegram_member_count_daily": ["date_label_jkt", "chat_id"],
+    # topic_id / sender_id are NULL on some metrics: keyed via stored
+    # generated columns that map NULL to 0
+    "telegram_yday_report": [
+        "date_label_jkt",
+        "chat_id",
+        "metric",
+        "topic_key",
+        "sender_key",
+    ],
+}
+
+TABLE_DDL = {
+    "telegram_messages_yday": """
+    CREATE TABLE IF NOT EXISTS `{table}` (
       date_label_jkt DATE,
-      topic_id INT,
+      chat_id BIGINT NOT NULL DEFAULT 0,
+      topic_id INT NOT NULL,
       topic_title VARCHAR(255),
-      message_id BIGINT,
+      message_id BIGINT NOT NULL,
       date_utc DATETIME,
       sender_id BIGINT,
       sender_username VARCHAR(64),
       text MEDIUMTEXT,
-      reply_to_msg_id BIGINT
+      reply_to_msg_id BIGINT,
+      media_type VARCHAR(16),
+      media_file_id BIGINT,
+      media_size BIGINT,
+      media_mime VARCHAR(127),
+      media_sha256 CHAR(64),
+      PRIMARY KEY (chat_id, topic_id, message_id),
+      KEY idx_date_label (date_label_jkt),
+      KEY idx_sender (sender_id)
     );
-    """
-
-    ddl_member_count = """
-    CREATE TABLE IF NOT EXISTS telegram_member_count_daily (
-      date_label_jkt DATE,
-      chat_id BIGINT,
+    """,
+    "telegram_member_count_daily": """
+    CREATE TABLE IF NOT EXISTS `{table}` (
+      date_label_jkt DATE NOT NULL,
+      chat_id BIGINT NOT NULL,
       chat_title VARCHAR(255),
       members_count INT,
-      taken_at_utc DATETIME
+      taken_at_utc DATETIME,
+      PRIMARY KEY (date_label_jkt, chat_id)
     );
-    """
-
-    ddl_report = """
-    CREATE TABLE IF NOT EXISTS telegram_yday_report (
-      date_label_jkt DATE,
-      metric VARCHAR(32),
+    """,
+    "telegram_yday_report": """
+    CREATE TABLE IF NOT EXISTS `{table}` (
+      date_label_jkt DATE NOT NULL,
+      chat_id BIGINT NOT NULL DEFAULT 0,
+      metric VARCHAR(32) NOT NULL,
       topic_id INT,
       topic_title VARCHAR(255),
       message_count INT,
       sender_id BIGINT,
       sender_username VARCHAR(64),
       rank_by_messages INT,
-      value BIGINT
+      value BIGINT,
+      topic_key INT AS (IFNULL(topic_id, 0)) STORED NOT NULL,
+      sender_key BIGINT AS (IFNULL(sender_id, 0)) STORED NOT NULL,
+      PRIMARY KEY (date_label_jkt, chat_id, metric, topic_key, sender_key),
+      KEY idx_sender (sender_id)
     );
+    """,
+}
+
+
+# partitioned variant of the message history table: the partition column
+# must be part of every unique key, so date_label_jkt leads the primary key
+MESSAGES_PARTITIONED_DDL = """
+CREATE TABLE IF NOT EXISTS `{table}` (
+  date_label_jkt DATE NOT NULL,
+  chat_id BIGINT NOT NULL DEFAULT 0,
+  topic_id INT NOT NULL,
+  topic_title VARCHAR(255),
+  message_id BIGINT NOT NULL,
+  date_utc DATETIME,
+  sender_id BIGINT,
+  sender_username VARCHAR(64),
+  text MEDIUMTEXT,
+  reply_to_msg_id BIGINT,
+  media_type VARCHAR(16),
+  media_file_id BIGINT,
+  media_size BIGINT,
+  media_mime VARCHAR(127),
+  media_sha256 CHAR(64),
+  PRIMARY KEY (date_label_jkt, chat_id, topic_id, message_id),
+  KEY idx_sender (sender_id)
+)
+PARTITION BY RANGE COLUMNS(date_label_jkt) (
+  PARTITION pmax VALUES LESS THAN (MAXVALUE)
+);
+"""
+
+# nullable columns added after a table was first created: migrate_schema
+# adds them to existing tables
+ADDED_COLUMNS = {
+    "telegram_messages_yday": {
+        "media_type": "VARCHAR(16)",
+        "media_file_id": "BIGINT",
+        "media_size": "BIGINT",
+        "media_mime": "VARCHAR(127)",
+        "media_sha256": "CHAR(64)",
+    },
+}
+
+
+def _table_ddl(partitioned: bool) -> dict:
+    ddl = dict(TABLE_DDL)
+    if partitioned:
+        ddl["telegram_messages_yday"] = MESSAGES_PARTITIONED_DDL
+    return ddl
+
+
+def ensure_tables_exist(conn, partitioned: bool = False, fulltext: bool = False):
+    """
+    Create tables if not exists using mysql-connector (no SQLAlchemy),
+    then migrate tables created before natural keys existed.
+    partitioned=True creates telegram_messages_yday RANGE-partitioned by
+    month of date_label_jkt (see ensure_partitions).
+    fulltext=True adds a FULLTEXT index on the message text (see
+    fulltext_search).
+    """
+    with conn.cursor() as cur:
+        for table_name, ddl in _table_ddl(partitioned).items():
+            cur.execute(ddl.format(table=table_name))
+    migrate_schema(conn, partitioned=partitioned)
+    if fulltext:
+        ensure_fulltext_index(conn, partitioned=partitioned)
+
+
+def _has_primary_key(cur, table_name: str) -> bool:
+    cur.execute(
+        "SELECT COUNT(*) FROM information_schema.TABLE_CONSTRAINTS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s "
+        "AND CONSTRAINT_TYPE = 'PRIMARY KEY'",
+        (table_name,),
+    )
+    return cur.fetchone()[0] > 0
+
+
+def _table_columns(cur, table_name: str) -> set:
+    cur.execute(
+        "SELECT COLUMN_NAME FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+        (table_name,),
+    )
+    return {r[0] for r in cur.fetchall()}
+
+
+def _is_partitioned(cur, table_name: str) -> bool:
+    cur.execute(
+        "SELECT COUNT(*) FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s "
+        "AND PARTITION_NAME IS NOT NULL",
+        (table_name,),
+    )
+    return cur.fetchone()[0] > 0
+
+
+def _add_missing_columns(cur, table_name: str, existing_cols: set) -> None:
+    """
+    ALTER the ADDED_COLUMNS a table lacks into it (existing_cols is updated).
+    """
+    missing = {
+        c: sql_type
+        for c, sql_type in ADDED_COLUMNS.get(table_name, {}).items()
+        if c not in existing_cols
+    }
+    if not missing:
+        return
+    print(f"[i] Migrating {table_name}: adding {', '.join(missing)}")
+    cur.execute(
+        f"ALTER TABLE `{table_name}` "
+        + ", ".join(f"ADD COLUMN `{c}` {t}" for c, t in missing.items())
+    )
+    existing_cols.update(missing)
+
+
+def migrate_schema(conn, partitioned: bool = False):
+    """
+    Add natural keys + indexes (and the chat_id key column) to tables that
+    were created without them, add ADDED_COLUMNS they lack, and
+    (partitioned=True) rebuild the message table as partitioned.
+    Rows are copied into the new table with INSERT IGNORE (so existing
+    duplicates collapse to one row; rows without a chat get chat_id 0)
+    and the tables are swapped atomically.
+    Tables already in the wanted shape are left untouched.
+    """
+    with conn.cursor() as cur:
+        for table_name, ddl in _table_ddl(partitioned).items():
+            needs_partitions = (
+                partitioned
+                and table_name == "telegram_messages_yday"
+                and not _is_partitioned(cur, table_name)
+            )
+            existing_cols = _table_columns(cur, table_name)
+            _add_missing_columns(cur, table_name, existing_cols)
+            if (
+                _has_primary_key(cur, table_name)
+                and "chat_id" in existing_cols
+                and not needs_partitions
+            ):
+                continue
+            new_name, old_name = f"{table_name}__new", f"{table_name}__old"
+            cols = ", ".join(
+                f"`{c}`" for c in TABLE_COLUMNS[table_name] if c in existing_cols
+            )
+            print(f"[i] Migrating {table_name}: adding keys + indexes")
+            if needs_partitions:
+                # the copy needs a partition for every existing day
+                cur.execute(
+                    f"SELECT MIN(date_label_jkt), MAX(date_label_jkt) "
+                    f"FROM `{table_name}`"
+                )
+                first_day, last_day = cur.fetchone()
+            cur.execute(f"DROP TABLE IF EXISTS `{new_name}`")
+            cur.execute(ddl.format(table=new_name))
+            if needs_partitions and first_day is not None:
+                ensure_partitions(conn, new_name, last_day, first_day)
+            cur.execute(
+                f"INSERT IGNORE INTO `{new_name}` ({cols}) "
+                f"SELECT {cols} FROM `{table_name}`"
+            )
+            cur.execute(
+                f"RENAME TABLE `{table_name}` TO `{old_name}`, "
+                f"`{new_name}` TO `{table_name}`"
+            )
+            cur.execute(f"DROP TABLE `{old_name}`")
+            print(f"[✓] Migrated {table_name}")
+
+
+# -------- Full-text search --------
+FULLTEXT_INDEX = "ft_text"
+
+
+def ensure_fulltext_index(conn, partitioned: bool = False) -> bool:
+    """
+    Add the FULLTEXT index on telegram_messages_yday.text if missing.
+    InnoDB has no FULLTEXT on partitioned tables: skipped there.
+    Return: True if the index was created
+    """
+    if partitioned:
+        print("[!] FULLTEXT index not supported on partitioned tables, skipped")
+        return False
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT COUNT(*) FROM information_schema.STATISTICS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s "
+            "AND INDEX_NAME = %s",
+            ("telegram_messages_yday", FULLTEXT_INDEX),
+        )
+        if cur.fetchone()[0] > 0:
+            return False
+        print("[i] Adding FULLTEXT index on telegram_messages_yday.text")
+        cur.execute(
+            f"ALTER TABLE `telegram_messages_yday` "
+            f"ADD FULLTEXT INDEX `{FULLTEXT_INDEX}` (`text`)"
+        )
+    print("[✓] FULLTEXT index added")
+    return True
+
+
+def fulltext_search(
+    conn,
+    query: str,
+    limit: int = 50,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    chat_id: Optional[int] = None,
+) -> List[Tuple[str, int, int]]:
+    """
+    Messages matching query (MySQL boolean mode syntax) through the
+    FULLTEXT index, best match first.
+    Return: (date YYYY-MM-DD, topic_id, message_id) per hit
+    """
+    sql = (
+        "SELECT date_label_jkt, topic_id, message_id "
+        "FROM telegram_messages_yday "
+        "WHERE MATCH(`text`) AGAINST (%s IN BOOLEAN MODE)"
+    )
+    params: list = [query]
+    for clause, value in (
+        ("date_label_jkt >= %s", since),
+        ("date_label_jkt <= %s", until),
+        ("chat_id = %s", chat_id),
+    ):
+        if value is not None:
+            sql += f" AND {clause}"
+            params.append(value)
+    sql += " ORDER BY MATCH(`text`) AGAINST (%s IN BOOLEAN MODE) DESC LIMIT %s"
+    params += [query, int(limit)]
+    with conn.cursor() as cur:
+        cur.execute(sql, params)
+        return [(str(d), int(t), int(m)) for d, t, m in cur.fetchall()]
+
+
+# -------- Partitions --------
+DUPLICATE_PARTITION_ERRNO = 1517  # ER_SAME_NAME_PARTITION
+RANGE_NOT_INCREASING_ERRNO = 1493  # ER_RANGE_NOT_INCREASING_ERROR
+
+
+def _month_start(d: date) -> date:
+    return date(d.year, d.month, 1)
+
+
+def _next_month(d: date) -> date:
+    return date(d.year + d.month // 12, d.month % 12 + 1, 1)
+
+
+def _list_partitions(cur, table_name: str) -> list[str]:
+    cur.execute(
+        "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s "
+        "AND PARTITION_NAME IS NOT NULL ORDER BY PARTITION_ORDINAL_POSITION",
+        (table_name,),
+    )
+    return [r[0] for r in cur.fetchall()]
+
+
+def _partition_bound(name: str) -> Optional[date]:
+    # VALUES LESS THAN of pYYYYMM (None: pmax, MAXVALUE)
+    if name == "pmax":
+        return None
+    return _next_month(date(int(name[1:5]), int(name[5:7]), 1))
+
+
+def _split_plan(existing: list[str], months: list[date]) -> dict:
+    """
+    Missing monthly partitions grouped by the partition whose range holds
+    them today: the first one (in order) bounded above the month. The lowest
+    pYYYYMM also holds every older day, pmax every later one.
+    Return: {holding partition: [(name, upper bound), ...] in month order}
     """
+    plan: dict = {}
+    for month in months:
+        name = f"p{month:%Y%m}"
+        if name in existing:
+            continue
+        holder = next(
+            p
+            for p in existing
+            if _partition_bound(p) is None or _partition_bound(p) > month
+        )
+        plan.setdefault(holder, []).append((name, _next_month(month)))
+    return plan
 
+
+def ensure_partitions(
+    conn, table_name: str, through: date, since: Optional[date] = None
+) -> list[str]:
+    """
+    Make sure monthly partitions pYYYYMM exist for every month from since
+    (default: month of through) up to through. Each missing month is split
+    off the partition that holds it: pmax for new months, the lowest (or
+    next higher) month for older ones, e.g. a backfill of past days.
+    Return: names of the partitions added
+    """
+    months = []
+    month = _month_start(since or through)
+    while month <= through:
+        months.append(month)
+        month = _next_month(month)
+
+    added = []
     with conn.cursor() as cur:
-        cur.execute(ddl_messages)
-        cur.execute(ddl_member_count)
-        cur.execute(ddl_report)
+        for attempt in range(3):
+            existing = _list_partitions(cur, table_name)
+            if not existing:
+                return []
+            plan = _split_plan(existing, months)
+            if not plan:
+                break
+            try:
+                for holder, wanted in plan.items():
+                    bound = _partition_bound(holder)
+                    parts = [
+                        f"PARTITION {name} VALUES LESS THAN ('{upper.isoformat()}')"
+                        for name, upper in wanted
+                    ] + [
+                        f"PARTITION {holder} VALUES LESS THAN "
+                        + (f"('{bound.isoformat()}')" if bound else "(MAXVALUE)")
+                    ]
+                    cur.execute(
+                        f"ALTER TABLE `{table_name}` REORGANIZE PARTITION {holder} "
+                        f"INTO ({', '.join(parts)})"
+                    )
+                    added += [name for name, _ in wanted]
+                break
+            except Error as e:
+                # another worker (multi-chat run) changed the partitions
+                # first: plan again from the current list
+                if e.errno not in (
+                    DUPLICATE_PARTITION_ERRNO,
+                    RANGE_NOT_INCREASING_ERRNO,
+                ):
+                    raise
+                if attempt == 2:
+                    print(f"[!] Partitions of {table_name} not added: {e}")
+    if added:
+        print(f"[✓] Added partitions to {table_name}: {added}")
+    return added
+
+
+def drop_partitions_before(conn, table_name: str, keep_from: date) -> list[str]:
+    """
+    Retention: drop whole monthly partitions that end on or before keep_from.
+    Return: names of the partitions dropped
+    """
+    keep_month = f"p{_month_start(keep_from):%Y%m}"
+    with conn.cursor() as cur:
+        old = [
+            n
+            for n in _list_partitions(cur, table_name)
+            if n != "pmax" and n < keep_month
+        ]
+        if old:
+            cur.execute(f"ALTER TABLE `{table_name}` DROP PARTITION {', '.join(old)}")
+            print(f"[✓] Dropped partitions from {table_name}: {old}")
+    return old
 
 
 # -------- Helpers --------
 def _extract_yyyymmdd_from_filename(path_str: str) -> Optional[str]:
     """
     Get 8-digit date from filename (YYYYMMDD) → 'YYYY-MM-DD' or None.
+    Hive-style paths (.../date=YYYY-MM-DD/part-0.parquet) are also read.
     """
+    m = re.search(r"date=(\d{4}-\d{2}-\d{2})", str(path_str))
+    if m:
+        return m.group(1)
     m = re.search(r"(\d{8})", os.path.basename(path_str))
     if not m:
         return None
@@ -103,9 +497,18 @@ def _chunk_rows(rows: List[Tuple], size: int) -> Iterable[List[Tuple]]:
 
 
 def _build_insert_sql(table_name: str, columns: list[str]) -> str:
+    """
+    Plain INSERT, or an upsert on the natural key for known tables.
+    """
     cols = ", ".join(f"`{c}`" for c in columns)
     placeholders = ", ".join(["%s"] * len(columns))
-    return f"INSERT INTO `{table_name}` ({cols}) VALUES ({placeholders})"
+    sql = f"INSERT INTO `{table_name}` ({cols}) VALUES ({placeholders})"
+    if table_name in TABLE_KEYS:
+        updates = ", ".join(
+            f"`{c}` = VALUES(`{c}`)" for c in columns if c not in TABLE_KEYS[table_name]
+        )
+        sql += f" ON DUPLICATE KEY UPDATE {updates}"
+    return sql
 
 
 def _normalize_datetimes(df: pd.DataFrame, cols: list[str]) -> None:
@@ -123,68 +526,185 @@ def _normalize_datetimes(df: pd.DataFrame, cols: list[str]) -> None:
             df[col] = s
 
 
-# -------- Load Parquet → MySQL (mysql-connector) --------
-def load_parquet_to_mysql(
-    conn,
+TABLE_COLUMNS = {
+    "telegram_messages_yday": [
+        "date_label_jkt",
+        "chat_id",
+        "topic_id",
+        "topic_title",
+        "message_id",
+        "date_utc",
+        "sender_id",
+        "sender_username",
+        "text",
+        "reply_to_msg_id",
+        "media_type",
+        "media_file_id",
+        "media_size",
+        "media_mime",
+        "media_sha256",
+    ],
+    "telegram_member_count_daily": [
+        "date_label_jkt",
+        "chat_id",
+        "chat_title",
+        "members_count",
+        "taken_at_utc",
+    ],
+    "telegram_yday_report": [
+        "date_label_jkt",
+        "chat_id",
+        "metric",
+        "topic_id",
+        "topic_title",
+        "message_count",
+        "sender_id",
+        "sender_username",
+        "rank_by_messages",
+        "value",
+    ],
+}
+
+DATETIME_COLUMNS = {
+    "telegram_messages_yday": ["date_utc"],
+    "telegram_member_count_daily": ["taken_at_utc"],
+}
+
+# NOT NULL columns that older parquet files may lack (or hold as NaN)
+COLUMN_DEFAULTS = {"chat_id": 0}
+
+LOAD_METHODS = ("executemany", "load_data")
+
+
+def _prepare_frame(
+    df: pd.DataFrame,
     parquet_path: str,
     table_name: str,
-    add_date_label_if_missing: bool = False,
-    date_label_col: str = "date_label_jkt",
-    batch_size: int = 1000,
-):
-    df = pd.read_parquet(parquet_path)
-
+    add_date_label_if_missing: bool,
+    date_label_col: str,
+) -> pd.DataFrame:
+    """
+    Add the date label if asked, normalize datetimes and keep the table's
+    columns (missing ones as NA), in table order.
+    """
     if add_date_label_if_missing and date_label_col not in df.columns:
         dt_str = _extract_yyyymmdd_from_filename(parquet_path)
         if dt_str:
             df[date_label_col] = dt_str
 
-    if table_name == "telegram_messages_yday":
-        expected_cols = [
-            "date_label_jkt",
-            "topic_id",
-            "topic_title",
-            "message_id",
-            "date_utc",
-            "sender_id",
-            "sender_username",
-            "text",
-            "reply_to_msg_id",
-        ]
-        _normalize_datetimes(df, ["date_utc"])
-    elif table_name == "telegram_member_count_daily":
-        expected_cols = [
-            "date_label_jkt",
-            "chat_id",
-            "chat_title",
-            "members_count",
-            "taken_at_utc",
-        ]
-        _normalize_datetimes(df, ["taken_at_utc"])
-    elif table_name == "telegram_yday_report":
-        expected_cols = [
-            "date_label_jkt",
-            "metric",
-            "topic_id",
-            "topic_title",
-            "message_count",
-            "sender_id",
-            "sender_username",
-            "rank_by_messages",
-            "value",
-        ]
-    else:
-        expected_cols = list(df.columns)
+    # compact parquet: dictionary-encoded strings arrive as categoricals
+    for col in df.columns[df.dtypes == "category"]:
+        df[col] = df[col].astype(object)
+
+    _normalize_datetimes(df, DATETIME_COLUMNS.get(table_name, []))
+    expected_cols = TABLE_COLUMNS.get(table_name, list(df.columns))
 
     for col in expected_cols:
         if col not in df.columns:
-            df[col] = pd.NA
+            df[col] = COLUMN_DEFAULTS.get(col, pd.NA)
+        elif col in COLUMN_DEFAULTS and df[col].isna().any():
+            df[col] = df[col].fillna(COLUMN_DEFAULTS[col]).astype("int64")
+
+    return df[expected_cols]
+
+
+def prepare_frame(
+    df: pd.DataFrame,
+    table_name: str,
+    date_label: Optional[str] = None,
+    date_label_col: str = "date_label_jkt",
+) -> pd.DataFrame:
+    """
+    Shape an in-memory frame for insert_frame: set the date label
+    ('YYYY-MM-DD') if given, normalize datetimes, keep the table's columns.
+    """
+    if date_label is not None and date_label_col not in df.columns:
+        df[date_label_col] = date_label
+    return _prepare_frame(df, "", table_name, False, date_label_col)
+
+
+def _tsv_escape_column(s: pd.Series) -> pd.Series:
+    """
+    Format one column for LOAD DATA (ESCAPED BY '\\'): NULL → \\N,
+    datetimes as 'YYYY-MM-DD HH:MM:SS', integral floats as ints.
+    """
+    isna = s.isna()
+    if pd.api.types.is_datetime64_any_dtype(s):
+        out = s.dt.strftime("%Y-%m-%d %H:%M:%S")
+    elif pd.api.types.is_float_dtype(s):
+        # e.g. reply_to_msg_id stored as double because of NaN
+        out = s.astype("Int64").astype(str)
+    elif pd.api.types.is_numeric_dtype(s):
+        out = s.astype(str)
+    else:
+        out = (
+            s.astype(str)
+            .str.replace("\\", "\\\\", regex=False)
+            .str.replace("\t", "\\t", regex=False)
+            .str.replace("\n", "\\n", regex=False)
+            .str.replace("\r", "\\r", regex=False)
+            .str.replace("\0", "\\0", regex=False)
+        )
+    return out.mask(isna, "\\N")
+
 
-    df = df[expected_cols]
+def _write_tsv_chunk(df: pd.DataFrame, f) -> None:
+    cols = [_tsv_escape_column(df[c]) for c in df.columns]
+    if not len(df):
+        return
+    lines = cols[0].str.cat(cols[1:], sep="\t") if len(cols) > 1 else cols[0]
+    f.write("\n".join(lines.tolist()))
+    f.write("\n")
 
-    df = df.where(pd.notnull(df), None)
 
-    sql = _build_insert_sql(table_name, expected_cols)
+def _load_data_sql(table_name: str, columns: list[str]) -> str:
+    cols = ", ".join(f"`{c}`" for c in columns)
+    # REPLACE makes reloads of the same rows idempotent on the natural key
+    replace = "REPLACE " if table_name in TABLE_KEYS else ""
+    return (
+        f"LOAD DATA LOCAL INFILE %s {replace}INTO TABLE `{table_name}` "
+        "CHARACTER SET utf8mb4 "
+        "FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' "
+        "LINES TERMINATED BY '\\n' "
+        f"({cols})"
+    )
+
+
+def _load_data_frames(conn, frames: Iterable[pd.DataFrame], table_name: str) -> int:
+    """
+    Write prepared frames to one temporary TSV and ingest it with a single
+    LOAD DATA LOCAL INFILE statement.
+    """
+    total = 0
+    fd, tsv_path = tempfile.mkstemp(prefix=f"{table_name}_", suffix=".tsv")
+    try:
+        columns = None
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            for df in frames:
+                columns = list(df.columns)
+                _write_tsv_chunk(df, f)
+                total += len(df)
+
+        if not total:
+            return 0
+
+        with conn.cursor() as cur:
+            cur.execute(_load_data_sql(table_name, columns), (tsv_path,))
+        return total
+    finally:
+        try:
+            os.remove(tsv_path)
+        except OSError:
+            pass
+
+
+def _executemany_frame(
+    conn, df: pd.DataFrame, table_name: str, batch_size: int = 1000
+) -> int:
+    # object first: nullable (Int64) columns would keep pd.NA instead of None
+    df = df.astype(object).where(pd.notnull(df), None)
+
+    sql = _build_insert_sql(table_name, list(df.columns))
 
     rows: List[Tuple] = list(map(tuple, df.itertuples(index=False, name=None)))
 
@@ -195,3 +715,280 @@ def load_parquet_to_mysql(
             total += len(chunk)
 
     return total
+
+
+def insert_frame(
+    conn,
+    df: pd.DataFrame,
+    table_name: str,
+    batch_size: int = 1000,
+    method: str = "executemany",
+) -> int:
+    """
+    Insert an already prepared frame (table columns, normalized datetimes).
+    Does not commit.
+    """
+    if method == "load_data":
+        return _load_data_frames(conn, [df], table_name)
+    return _executemany_frame(conn, df, table_name, batch_size)
+
+
+def _iter_prepared_batches(
+    parquet_path: str,
+    table_name: str,
+    add_date_label_if_missing: bool,
+    date_label_col: str,
+    rows_per_batch: int,
+) -> Iterable[pd.DataFrame]:
+    pf = pq.ParquetFile(parquet_path)
+    for batch in pf.iter_batches(batch_size=rows_per_batch):
+        yield _prepare_frame(
+            batch.to_pandas(types_mapper=INT64_NULLABLE),
+            parquet_path,
+            table_name,
+            add_date_label_if_missing,
+            date_label_col,
+        )
+
+
+def _load_data_infile(
+    conn,
+    parquet_path: str,
+    table_name: str,
+    add_date_label_if_missing: bool,
+    date_label_col: str,
+    batch_size: int,
+) -> int:
+    """
+    Stream the parquet in record batches to a temporary TSV and ingest it
+    with one LOAD DATA LOCAL INFILE statement.
+    """
+    return _load_data_frames(
+        conn,
+        _iter_prepared_batches(
+            parquet_path,
+            table_name,
+            add_date_label_if_missing,
+            date_label_col,
+            max(batch_size, 10_000),
+        ),
+        table_name,
+    )
+
+
+def _insert_executemany(
+    conn,
+    parquet_path: str,
+    table_name: str,
+    add_date_label_if_missing: bool,
+    date_label_col: str,
+    batch_size: int,
+) -> int:
+    df = _prepare_frame(
+        pq.read_table(parquet_path).to_pandas(types_mapper=INT64_NULLABLE),
+        parquet_path,
+        table_name,
+        add_date_label_if_missing,
+        date_label_col,
+    )
+    return _executemany_frame(conn, df, table_name, batch_size)
+
+
+def _count_load(table_name: str, rows: int, elapsed: float) -> None:
+    metrics.count("mysql_rows_total", rows, table=table_name)
+    metrics.count("mysql_load_seconds_total", elapsed, table=table_name)
+
+
+# -------- Load Parquet → MySQL (mysql-connector) --------
+def load_parquet_to_mysql(
+    conn,
+    parquet_path: str,
+    table_name: str,
+    add_date_label_if_missing: bool = False,
+    date_label_col: str = "date_label_jkt",
+    batch_size: int = 1000,
+    method: str = "executemany",
+):
+    """
+    Load one parquet file into table_name.
+    method="executemany": INSERT in chunks of batch_size (default).
+    method="load_data": bulk LOAD DATA LOCAL INFILE from a temporary TSV;
+    falls back to executemany if the server/connection refuses it.
+    Prints rows/sec for the path used. Return: number of rows loaded
+    """
+    if method not in LOAD_METHODS:
+        raise ValueError(f"Unknown load method {method!r}, use one of {LOAD_METHODS}")
+
+    args = (
+        conn,
+        parquet_path,
+        table_name,
+        add_date_label_if_missing,
+        date_label_col,
+        batch_size,
+    )
+    t0 = time.perf_counter()
+    total = None
+    if method == "load_data":
+        try:
+            total = _load_data_infile(*args)
+        except Error as e:
+            print(f"[!] LOAD DATA failed for {table_name} ({e}), using executemany")
+            method = "executemany"
+            t0 = time.perf_counter()
+    if total is None:
+        total = _insert_executemany(*args)
+
+    elapsed = time.perf_counter() - t0
+    rate = total / elapsed if elapsed > 0 else float(total)
+    print(
+        f"[i] {table_name}: {total} rows in {elapsed:.2f}s "
+        f"({rate:,.0f} rows/s, {method})"
+    )
+    _count_load(table_name, total, elapsed)
+    return total
+
+
+# -------- Pooled / parallel loads --------
+DEADLOCK_ERRNOS = (1205, 1213)  # lock wait timeout, deadlock
+
+
+def get_pool(
+    mysql_host: str,
+    mysql_user: str,
+    mysql_password: str,
+    mysql_database: str,
+    mysql_port: int = 3306,
+    pool_size: int = 4,
+    allow_local_infile: bool = False,
+    pool_name: str = "telegram_load",
+):
+    """
+    Create a mysql-connector connection pool (utf8mb4, autocommit off:
+    callers commit per batch).
+    """
+    return pooling.MySQLConnectionPool(
+        pool_name=pool_name,
+        pool_size=pool_size,
+        host=mysql_host,
+        user=mysql_user,
+        password=mysql_password,
+        database=mysql_database,
+        port=int(mysql_port),
+        charset="utf8mb4",
+        use_unicode=True,
+        autocommit=False,
+        allow_local_infile=allow_local_infile,
+    )
+
+
+def commit_batch(conn, fn, retries: int = 3) -> int:
+    """
+    Run fn() in its own transaction and commit; on deadlock / lock wait
+    timeout roll back and retry.
+    """
+    for attempt in range(retries + 1):
+        try:
+            n = fn()
+            conn.commit()
+            return n
+        except Error as e:
+            conn.rollback()
+            if e.errno in DEADLOCK_ERRNOS and attempt < retries:
+                time.sleep(0.2 * (attempt + 1))
+                continue
+            raise
+
+
+def load_parquet_to_mysql_parallel(
+    pool,
+    parquet_path: str,
+    table_name: str,
+    add_date_label_if_missing: bool = False,
+    date_label_col: str = "date_label_jkt",
+    streams: int = 4,
+    batch_size: int = 1000,
+    method: str = "executemany",
+    rows_per_commit: int = 10_000,
+) -> int:
+    """
+    Load one parquet file over several pooled connections at once.
+    The file is read in record batches of rows_per_commit, handed out to
+    `streams` worker threads, and each batch is committed in its own
+    transaction. Return: number of rows loaded
+    """
+    if method not in LOAD_METHODS:
+        raise ValueError(f"Unknown load method {method!r}, use one of {LOAD_METHODS}")
+
+    work: "queue.Queue[Optional[pd.DataFrame]]" = queue.Queue(maxsize=streams * 2)
+
+    def _stream() -> int:
+        total, error, stream_method, conn = 0, None, method, None
+        try:
+            conn = pool.get_connection()
+        except Exception as e:
+            # no connection: still drain, so the reader never blocks
+            error = e
+        try:
+            while True:
+                df = work.get()
+                if df is None:
+                    break
+                if error is not None:
+                    continue  # keep draining so the reader never blocks
+                try:
+                    try:
+                        total += commit_batch(
+                            conn,
+                            lambda: insert_frame(
+                                conn, df, table_name, batch_size, stream_method
+                            ),
+                        )
+                    except Error as e:
+                        if stream_method != "load_data":
+                            raise
+                        print(
+                            f"[!] LOAD DATA failed for {table_name} ({e}), "
+                            "using executemany"
+                        )
+                        stream_method = "executemany"
+                        total += commit_batch(
+                            conn,
+                            lambda: insert_frame(
+                                conn, df, table_name, batch_size, stream_method
+                            ),
+                        )
+                except Exception as e:
+                    error = e
+        finally:
+            if conn is not None:
+                conn.close()  # back to the pool
+        if error is not None:
+            raise error
+        return total
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=streams) as ex:
+        futures = [ex.submit(_stream) for _ in range(streams)]
+        try:
+            for df in _iter_prepared_batches(
+                parquet_path,
+                table_name,
+                add_date_label_if_missing,
+                date_label_col,
+                rows_per_commit,
+            ):
+                work.put(df)
+        finally:
+            for _ in futures:
+                work.put(None)
+        total = sum(f.result() for f in futures)
+
+    elapsed = time.perf_counter() - t0
+    rate = total / elapsed if elapsed > 0 else float(total)
+    print(
+        f"[i] {table_name}: {total} rows in {elapsed:.2f}s "
+        f"({rate:,.0f} rows/s, {method} x{streams} streams)"
+    )
+    _count_load(table_name, total, elapsed)
+    return total
@@ -0,0 +1,94 @@
+import re
+import threading
+import time
+from collections import Counter
+
+from db import TABLE_COLUMNS
+
+_TABLE_RE = re.compile(r"INTO\s+(?:TABLE\s+)?`?(\w+)`?", re.IGNORECASE)
+
+
+class FakePool:
+    """
+    In-memory stand-in for a mysql-connector pool: statements are accepted
+    and counted (rows per table, commits), nothing is stored. Every
+    statement costs latency_s of simulated round trip, so loads measure
+    the client side (parquet read, frame prep, TSV / row building) plus a
+    configurable server cost. Schema checks always find the current
+    tables, so ensure_tables_exist is a no-op.
+    """
+
+    def __init__(self, latency_s: float = 0.0):
+        self.latency_s = latency_s
+        self.rows = Counter()
+        self.statements = 0
+        self.commits = 0
+        self._lock = threading.Lock()
+
+    def get_connection(self):
+        return FakeConnection(self)
+
+    def _record(self, sql: str, n_rows: int) -> None:
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        m = _TABLE_RE.search(sql)
+        with self._lock:
+            self.statements += 1
+            if m and n_rows:
+                self.rows[m.group(1)] += n_rows
+
+
+class FakeConnection:
+    def __init__(self, pool: FakePool):
+        self.pool = pool
+
+    def cursor(self):
+        return FakeCursor(self.pool)
+
+    def commit(self):
+        with self.pool._lock:
+            self.pool.commits += 1
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeCursor:
+    def __init__(self, pool: FakePool):
+        self.pool = pool
+        self._result = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql: str, params=None):
+        n_rows, self._result = 0, [(1,)]
+        if sql.startswith("LOAD DATA"):
+            # the TSV is deleted right after the statement: count it now
+            with open(params[0], "rb") as f:
+                n_rows = sum(1 for _ in f)
+        elif "information_schema.COLUMNS" in sql:
+            self._result = [(c,) for c in TABLE_COLUMNS.get(params[0], [])]
+        elif "information_schema.PARTITIONS" in sql:
+            # never partitioned
+            self._result = [(0,)] if "COUNT(*)" in sql else []
+        self.pool._record(sql, n_rows)
+
+    def executemany(self, sql: str, rows):
+        self._result = []
+        self.pool._record(sql, len(rows))
+
+    def fetchone(self):
+        return self._result[0] if self._result else None
+
+    def fetchall(self):
+        return list(self._result)
+
+    def close(self):
+        pass
@@ -0,0 +1,311 @@
+import asyncio
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+import numpy as np
+from telethon.errors.rpcerrorlist import FloodWaitError
+from telethon.tl.functions.channels import (
+    GetChannelsRequest,
+    GetForumTopicsRequest,
+    GetFullChannelRequest,
+)
+from telethon.tl.functions.users import GetUsersRequest
+from telethon.tl.types import InputPeerUser
+
+# first synthetic sender id (looks like a real user id)
+SENDER_ID_BASE = 100_000_000
+# first synthetic media file id: above 2**53, like real Telegram file ids
+MEDIA_ID_BASE = 5_000_000_000_000_000_000
+
+
+class SyntheticForum:
+    """
+    A forum chat with `topics` topics and `messages` messages spread over
+    [start_utc, end_utc). Topic sizes and senders follow Zipf distributions
+    (sender_dist="uniform" for evenly spread senders); dormant_topics topics
+    have no message in the window. Messages ids grow with time, as in
+    Telegram, and are kept as numpy arrays per topic.
+    A media_ratio share of messages carry a photo or document drawn (Zipf)
+    from media_files files, so popular files are reposted; the last tenth
+    of the files re-upload the content of others under new file ids.
+    """
+
+    def __init__(
+        self,
+        start_utc: datetime,
+        end_utc: datetime,
+        topics: int = 40,
+        messages: int = 100_000,
+        senders: int = 2_000,
+        sender_dist: str = "zipf",
+        dormant_topics: int = 0,
+        reply_ratio: float = 0.3,
+        no_username_ratio: float = 0.2,
+        media_ratio: float = 0.0,
+        media_files: int = 500,
+        seed: int = 1,
+    ):
+        rng = np.random.default_rng(seed)
+        self.chat_id = 1_000_000 + seed
+        self.start_utc, self.end_utc = start_utc, end_utc
+        self.topic_ids = np.arange(1, topics + 1)
+        active = self.topic_ids[dormant_topics:]
+
+        # topic of every message (Zipf-sized topics), in time order
+        weights = 1.0 / np.arange(1, len(active) + 1)
+        topic_of = rng.choice(active, size=messages, p=weights / weights.sum())
+        t0, t1 = start_utc.timestamp(), end_utc.timestamp()
+        ts = np.sort(rng.uniform(t0, t1, size=messages))
+        ids = np.arange(10_000, 10_000 + messages, dtype=np.int64)
+
+        if sender_dist == "uniform":
+            rank = rng.integers(0, senders, size=messages)
+        else:
+            rank = np.minimum(rng.zipf(1.3, size=messages), senders) - 1
+        sender_ids = SENDER_ID_BASE + rank.astype(np.int64)
+        media_of = np.where(
+            rng.random(messages) < media_ratio,
+            np.minimum(rng.zipf(1.5, size=messages), media_files) - 1,
+            -1,
+        )
+        self.media_sizes = rng.integers(1_000, 200_000, size=media_files)
+        self.no_username = set(
+            (SENDER_ID_BASE + np.flatnonzero(rng.random(senders) < no_username_ratio))
+            .astype(int)
+            .tolist()
+        )
+
+        self._topics: Dict[int, dict] = {}
+        for tid in self.topic_ids:
+            mask = topic_of == tid
+            t_ids = ids[mask]
+            # replies point at a recent message of the same topic,
+            # top-level messages at the topic id
+            reply_to = np.full(len(t_ids), tid, dtype=np.int64)
+            is_reply = rng.random(len(t_ids)) < reply_ratio
+            back = rng.integers(1, 10, size=len(t_ids))
+            idx = np.arange(len(t_ids)) - back
+            ok = is_reply & (idx >= 0)
+            reply_to[ok] = t_ids[idx[ok]]
+            if len(t_ids) == 0:
+                # dormant: one old message, a month before the window
+                t_ids = np.array([int(tid)], dtype=np.int64)
+                ts_t = np.array([t0 - 30 * 86400])
+                senders_t = np.array([SENDER_ID_BASE], dtype=np.int64)
+                reply_to = np.array([int(tid)], dtype=np.int64)
+                media_t = np.array([-1])
+            else:
+                ts_t, senders_t, media_t = ts[mask], sender_ids[mask], media_of[mask]
+            self._topics[int(tid)] = {
+                "ids": t_ids,
+                "ts": ts_t,
+                "sender": senders_t,
+                "reply_to": reply_to,
+                "media": media_t,
+            }
+
+    @property
+    def total_messages(self) -> int:
+        return sum(
+            int(((t["ts"] >= self.start_utc.timestamp())).sum())
+            for t in self._topics.values()
+        )
+
+    def username(self, sender_id: int) -> Optional[str]:
+        return None if sender_id in self.no_username else f"user{sender_id}"
+
+    def media_bytes(self, file_id: int) -> bytes:
+        """
+        Content of a media file (re-uploads share their original's).
+        """
+        k = file_id - MEDIA_ID_BASE
+        original = k % max(1, len(self.media_sizes) * 9 // 10)
+        size = int(self.media_sizes[original])
+        return (f"media {original} ".encode() * (size // 8 + 1))[:size]
+
+    def _media(self, k: int) -> dict:
+        """
+        Message attributes of media file k: even files are photos, odd ones
+        videos or PDF documents.
+        """
+        file_id = MEDIA_ID_BASE + k
+        size = len(self.media_bytes(file_id))
+        if k % 2 == 0:
+            return {
+                "photo": SimpleNamespace(id=file_id),
+                "file": SimpleNamespace(size=size),
+            }
+        mime = "video/mp4" if k % 4 == 1 else "application/pdf"
+        document = SimpleNamespace(id=file_id, size=size, mime_type=mime)
+        attrs = {"document": document, "file": SimpleNamespace(size=size)}
+        if mime == "video/mp4":
+            attrs["video"] = document
+        return attrs
+
+    def _message(self, topic_id: int, i: int, with_sender: bool = True):
+        t = self._topics[topic_id]
+        sender_id = int(t["sender"][i])
+        msg_id = int(t["ids"][i])
+        k = int(t["media"][i])
+        return SimpleNamespace(
+            id=msg_id,
+            date=datetime.fromtimestamp(float(t["ts"][i]), tz=timezone.utc),
+            sender_id=sender_id,
+            sender=(
+                SimpleNamespace(id=sender_id, username=self.username(sender_id))
+                if with_sender
+                else None
+            ),
+            message=f"synthetic message {msg_id} in topic {topic_id}",
+            reply_to_msg_id=int(t["reply_to"][i]),
+            **(self._media(k) if k >= 0 else {}),
+        )
+
+    def page(
+        self,
+        topic_id: int,
+        limit: int,
+        offset_id: int = 0,
+        offset_date: Optional[datetime] = None,
+        min_id: int = 0,
+        max_id: int = 0,
+    ) -> List:
+        """
+        One history page of a topic, newest first (GetReplies semantics).
+        """
+        t = self._topics.get(topic_id)
+        if t is None:
+            return []
+        hi = len(t["ids"])
+        if offset_id:
+            hi = min(hi, int(np.searchsorted(t["ids"], offset_id, "left")))
+        if max_id:
+            hi = min(hi, int(np.searchsorted(t["ids"], max_id, "left")))
+        if offset_date is not None:
+            hi = min(hi, int(np.searchsorted(t["ts"], offset_date.timestamp(), "left")))
+        lo = max(int(np.searchsorted(t["ids"], min_id, "right")), hi - limit, 0)
+        return [self._message(topic_id, i) for i in range(hi - 1, lo - 1, -1)]
+
+    def topics(self) -> List:
+        out = []
+        for tid in self.topic_ids[::-1]:
+            t = self._topics[int(tid)]
+            out.append(
+                SimpleNamespace(
+                    id=int(tid), title=f"Topic {tid}", top_message=int(t["ids"][-1])
+                )
+            )
+        return out
+
+
+class FakeTelegramClient:
+    """
+    Offline stand-in for TelegramClient over a SyntheticForum: answers the
+    RPCs the scraper uses (forum topics, history pages, users, full channel,
+    media downloads) with latency_s of simulated network time per call, and raises FloodWait
+    (flood_seconds) on every flood_every-th call when flood_every > 0.
+    """
+
+    def __init__(
+        self,
+        forum: SyntheticForum,
+        latency_s: float = 0.0,
+        flood_every: int = 0,
+        flood_seconds: int = 1,
+        members: int = 12_345,
+    ):
+        self.forum = forum
+        self.latency_s = latency_s
+        self.flood_every = flood_every
+        self.flood_seconds = flood_seconds
+        self.members = members
+        self.flood_sleep_threshold = 60
+        self.rpc_calls = 0
+        self.flood_waits = 0
+        self.downloads = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def _rpc(self) -> None:
+        self.rpc_calls += 1
+        if self.latency_s:
+            await asyncio.sleep(self.latency_s)
+        if self.flood_every and self.rpc_calls % self.flood_every == 0:
+            self.flood_waits += 1
+            raise FloodWaitError(request=None, capture=self.flood_seconds)
+
+    async def get_entity(self, entity):
+        await self._rpc()
+        if isinstance(entity, int) and entity != self.forum.chat_id:
+            return SimpleNamespace(id=entity, username=self.forum.username(entity))
+        return SimpleNamespace(
+            id=self.forum.chat_id, title="Synthetic forum", username=None
+        )
+
+    async def get_input_entity(self, entity):
+        # ids are always in the (fake) session cache
+        return InputPeerUser(int(entity), 0)
+
+    async def get_messages(
+        self,
+        chat,
+        limit: int = 100,
+        reply_to: Optional[int] = None,
+        offset_id: int = 0,
+        offset_date: Optional[datetime] = None,
+        min_id: int = 0,
+        max_id: int = 0,
+        **kwargs,
+    ) -> List:
+        await self._rpc()
+        return self.forum.page(reply_to, limit, offset_id, offset_date, min_id, max_id)
+
+    async def download_media(self, media, file: str) -> str:
+        await self._rpc()
+        self.downloads += 1
+        with open(file, "wb") as f:
+            f.write(self.forum.media_bytes(media.id))
+        return file
+
+    async def iter_messages(self, chat, limit: Optional[int] = None, **kwargs):
+        offset_id, n = kwargs.pop("offset_id", 0), 0
+        while True:
+            page = await self.get_messages(
+                chat, limit=100, offset_id=offset_id, **kwargs
+            )
+            for msg in page:
+                if limit is not None and n >= limit:
+                    return
+                n += 1
+                yield msg
+            if len(page) < 100:
+                return
+            offset_id, kwargs["offset_date"] = page[-1].id, None
+
+    async def __call__(self, request):
+        await self._rpc()
+        if isinstance(request, GetForumTopicsRequest):
+            topics = [
+                t
+                for t in self.forum.topics()
+                if not request.offset_topic or t.id < request.offset_topic
+            ][: request.limit]
+            top = [self.forum.page(t.id, 1)[0] for t in topics]
+            return SimpleNamespace(topics=topics, messages=top)
+        if isinstance(request, GetUsersRequest):
+            return [
+                SimpleNamespace(id=u.user_id, username=self.forum.username(u.user_id))
+                for u in request.id
+            ]
+        if isinstance(request, GetChannelsRequest):
+            return SimpleNamespace(chats=[])
+        if isinstance(request, GetFullChannelRequest):
+            return SimpleNamespace(
+                full_chat=SimpleNamespace(participants_count=self.members)
+            )
+        raise NotImplementedError(type(request).__name__)
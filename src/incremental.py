@@ -0,0 +1,124 @@
+import json
+import os
+import shutil
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from parquet_sink import INT64_NULLABLE, MESSAGE_SCHEMA
+
+JKT_OFFSET = timedelta(hours=7)
+
+
+# -------- High-water marks --------
+def load_high_water_marks(path: Path) -> Dict[int, int]:
+    """
+    Load {topic_id: last harvested message_id} from the state file.
+    """
+    path = Path(path)
+    if not path.exists():
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+    return {int(k): int(v) for k, v in raw.items()}
+
+
+def save_high_water_marks(path: Path, marks: Dict[int, int]) -> None:
+    """
+    Write the state file atomically so a crash never leaves it half-written.
+    """
+    path = Path(path)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({str(k): v for k, v in sorted(marks.items())}, f, indent=1)
+    os.replace(tmp, path)
+
+
+# -------- Increments --------
+def read_messages_frame(path: Path) -> pd.DataFrame:
+    """
+    A messages parquet as a DataFrame, integer ids as nullable Int64.
+    """
+    return pq.read_table(path).to_pandas(types_mapper=INT64_NULLABLE)
+
+
+def messages_table(df: pd.DataFrame) -> pa.Table:
+    """
+    Rows of a messages DataFrame as a MESSAGE_SCHEMA table without pandas
+    metadata, like the files MessageParquetWriter writes (columns it
+    lacks, e.g. from before a schema change, are null).
+    """
+    return pa.Table.from_pandas(
+        df.reindex(columns=MESSAGE_SCHEMA.names),
+        schema=MESSAGE_SCHEMA,
+        preserve_index=False,
+    ).replace_schema_metadata(None)
+
+
+def _jkt_label_str(date_utc_iso: str) -> str:
+    return (datetime.fromisoformat(date_utc_iso) + JKT_OFFSET).strftime("%Y%m%d")
+
+
+def write_increment(out_dir: Path, df: pd.DataFrame, run_label: str) -> List[Path]:
+    """
+    Split harvested rows by Jakarta day and write one part file per day:
+    <out_dir>/increments/YYYYMMDD/inc_<run_label>.parquet
+    in MESSAGE_SCHEMA (a column all null in one part keeps its type)
+    """
+    if df.empty:
+        return []
+    labels = df["date_utc"].map(_jkt_label_str)
+    paths = []
+    for day, part in df.groupby(labels, sort=True):
+        day_dir = Path(out_dir) / "increments" / day
+        day_dir.mkdir(parents=True, exist_ok=True)
+        path = day_dir / f"inc_{run_label}.parquet"
+        pq.write_table(messages_table(part), path)
+        paths.append(path)
+    return paths
+
+
+def collect_increments(out_dir: Path, yday_str: str) -> pd.DataFrame:
+    """
+    Read every increment of one Jakarta day, deduped and sorted like the
+    daily parquet.
+    """
+    day_dir = Path(out_dir) / "increments" / yday_str
+    parts = sorted(day_dir.glob("inc_*.parquet")) if day_dir.exists() else []
+    if not parts:
+        return pd.DataFrame()
+    df = pd.concat([read_messages_frame(p) for p in parts], ignore_index=True)
+    df.drop_duplicates(subset=["topic_id", "message_id"], keep="last", inplace=True)
+    df.sort_values(["topic_id", "message_id"], inplace=True)
+    df.reset_index(drop=True, inplace=True)
+    return df
+
+
+def drop_increments(out_dir: Path, yday_str: str) -> None:
+    """
+    Remove one Jakarta day's increments, once its daily parquet is built.
+    """
+    shutil.rmtree(Path(out_dir) / "increments" / yday_str, ignore_errors=True)
+
+
+def sweep_stale_runs(out_dir: Path) -> int:
+    """
+    Remove the run files (and their writer's spill / temporary files) that
+    a crashed run left in <out_dir>/increments. Their rows are fetched
+    again: marks only advance once a run's increment is on disk.
+    Return: number of entries removed
+    """
+    inc_dir = Path(out_dir) / "increments"
+    if not inc_dir.exists():
+        return 0
+    stale = list(inc_dir.glob("_run_*.parquet")) + list(inc_dir.glob("__run_*"))
+    for path in stale:
+        if path.is_dir():
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            path.unlink(missing_ok=True)
+    return len(stale)
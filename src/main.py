@@ -1,18 +1,48 @@
 import os
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from pathlib import Path
-from datetime import datetime, timezone, timedelta
+from datetime import date, datetime, timezone, timedelta
 
 import pandas as pd
+import pyarrow.parquet as pq
 from dotenv import load_dotenv
-from telethon import TelegramClient
-from telethon.errors.rpcerrorlist import FloodWaitError
 
-from utils_time import jakarta_bounds_yesterday_utc, yday_label_str
-from topics import fetch_all_topics, iter_topic_messages_yesterday, resolve_username
-from members import fetch_member_count
+from utils_time import (
+    day_label_str,
+    jakarta_bounds_yesterday_utc,
+    jakarta_day_bounds_utc,
+    jakarta_days,
+    yday_label_str,
+)
+import metrics
+from sender_cache import SenderCache
+from parquet_sink import (
+    MESSAGE_SCHEMA,
+    MessageParquetWriter,
+    sweep_spill_dirs,
+    write_messages_table,
+)
+from storage import dataset_path
+from incremental import (
+    collect_increments,
+    drop_increments,
+    load_high_water_marks,
+    messages_table,
+    read_messages_frame,
+    save_high_water_marks,
+    sweep_stale_runs,
+    write_increment,
+)
 from reports import build_yesterday_report_parquet
-from db import *
+from threads import THREAD_INPUT_COLS
+from rolling import build_rolling_report_parquet
+from search import SearchIndex
+
+# Telethon (topics, members, ratelimit) and mysql-connector (db, pipeline)
+# are imported by the functions that use them, so runs that never talk to
+# Telegram or MySQL (cli.py report / load) do not pay for them at startup
 
 # ====== CONFIG ======
 load_dotenv()
@@ -26,115 +56,806 @@ MYSQL_USER = os.getenv("MYSQL_USER", "")
 MYSQL_PASSWORD = os.getenv("MYSQL_PASSWORD", "")
 MYSQL_DATABASE = os.getenv("MYSQL_DATABASE", "")
 MYSQL_PORT = int(os.getenv("MYSQL_PORT", "3306"))
+# "executemany" (default) or "load_data" (LOAD DATA LOCAL INFILE bulk path)
+MYSQL_LOAD_METHOD = os.getenv("MYSQL_LOAD_METHOD", "executemany")
+# parallel pooled connections used to load the messages parquet
+MYSQL_LOAD_STREAMS = max(1, int(os.getenv("MYSQL_LOAD_STREAMS", "4")))
+# stream message batches into MySQL while harvesting (daily mode only)
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "0") == "1"
+# flushed batches allowed to wait for MySQL before the harvest pauses
+PIPELINE_MAX_PENDING = int(os.getenv("PIPELINE_MAX_PENDING", "8"))
+# RANGE-partition telegram_messages_yday by month of date_label_jkt
+MYSQL_PARTITIONED = os.getenv("MYSQL_PARTITIONED", "0") == "1"
+# FULLTEXT index on message text (MySQL-side search; not on partitioned tables)
+MYSQL_FULLTEXT = os.getenv("MYSQL_FULLTEXT", "0") == "1"
+
+# number of topics harvested at once over the single client
+TOPIC_CONCURRENCY = max(1, int(os.getenv("TOPIC_CONCURRENCY", "4")))
+
+# shared RPC rate limiter: starting rate / burst / ceiling (requests per second);
+# the rate adapts between TG_MIN_RPS and TG_MAX_RPS from FloodWait responses
+TG_RPS = float(os.getenv("TG_RPS", "5"))
+TG_BURST = int(os.getenv("TG_BURST", "5"))
+TG_MIN_RPS = float(os.getenv("TG_MIN_RPS", "0.2"))
+TG_MAX_RPS = float(os.getenv("TG_MAX_RPS", "30"))
 
-OUT_DIR = Path("telegram_dump")
+# per-chat output directory when run by the multi-chat orchestrator
+OUT_DIR = Path(os.getenv("OUT_DIR", "telegram_dump"))
 OUT_DIR.mkdir(parents=True, exist_ok=True)
+
+# persistent sender_id -> username cache, shared across daily runs
+SENDER_CACHE_PATH = OUT_DIR / "sender_cache.sqlite"
+SENDER_CACHE_TTL_DAYS = float(os.getenv("SENDER_CACHE_TTL_DAYS", "7"))
+SENDER_CACHE_MAX = int(os.getenv("SENDER_CACHE_MAX", "50000"))
+
+# "daily" rescans yesterday; "incremental" fetches only above per-topic marks;
+# "backfill" harvests every Jakarta day from BACKFILL_FROM to BACKFILL_TO
+HARVEST_MODE = os.getenv("HARVEST_MODE", "daily")
+HWM_STATE_PATH = OUT_DIR / "harvest_state.json"
+
+# rows buffered per topic before a flush, and row group size of the output
+HARVEST_FLUSH_ROWS = int(os.getenv("HARVEST_FLUSH_ROWS", "5000"))
+PARQUET_ROW_GROUP_SIZE = int(os.getenv("PARQUET_ROW_GROUP_SIZE", "50000"))
+# checkpoints (spill directories) of crashed runs not resumed within this
+# many days are removed when a harvest starts
+SPILL_RETENTION_DAYS = float(os.getenv("SPILL_RETENTION_DAYS", "7"))
+
+# "flat" (yesterday_*_YYYYMMDD.parquet) or "hive" (<kind>/date=YYYY-MM-DD/)
+OUT_LAYOUT = os.getenv("OUT_LAYOUT", "flat")
+# compact messages parquet: timestamp date_utc, dictionary-encoded titles and
+# usernames, zstd, statistics + sort order for pruning (readers take both)
+PARQUET_COMPACT = os.getenv("PARQUET_COMPACT", "0") == "1"
+
+# backfill range (YYYY-MM-DD, Jakarta days, both included) and days run at once
+BACKFILL_FROM = os.getenv("BACKFILL_FROM", "")
+BACKFILL_TO = os.getenv("BACKFILL_TO", "")
+BACKFILL_CONCURRENCY = max(1, int(os.getenv("BACKFILL_CONCURRENCY", "2")))
+
+# media posts: record kind / file id / size / MIME type / sha256 in the
+# messages parquet; MEDIA_DOWNLOAD also downloads every unique file once into
+# the content-addressed store in MEDIA_DIR (and implies MEDIA_METADATA)
+MEDIA_DOWNLOAD = os.getenv("MEDIA_DOWNLOAD", "0") == "1"
+MEDIA_METADATA = MEDIA_DOWNLOAD or os.getenv("MEDIA_METADATA", "0") == "1"
+MEDIA_DIR = Path(os.getenv("MEDIA_DIR", str(OUT_DIR / "media")))
+# parallel downloads, and largest file downloaded in MB (0 = no limit)
+MEDIA_DOWNLOAD_CONCURRENCY = max(1, int(os.getenv("MEDIA_DOWNLOAD_CONCURRENCY", "2")))
+MEDIA_MAX_MB = float(os.getenv("MEDIA_MAX_MB", "50"))
+
+# rolling report windows in days, e.g. "7,30" (empty disables it)
+ROLLING_REPORT_DAYS = [
+    int(w) for w in os.getenv("ROLLING_REPORT_DAYS", "7,30").split(",") if w.strip()
+]
+
+# full-text search index of message text (SQLite FTS5), fed after each harvest
+SEARCH_INDEX = os.getenv("SEARCH_INDEX", "0") == "1"
+SEARCH_INDEX_PATH = Path(
+    os.getenv("SEARCH_INDEX_PATH", str(OUT_DIR / "search_index.sqlite"))
+)
+
+# run summary (JSON lines, one object per run: stage times, RPCs, rows, bytes)
+RUN_SUMMARY_PATH = Path(
+    os.getenv("RUN_SUMMARY_PATH", str(OUT_DIR / "run_summary.jsonl"))
+)
+# Prometheus textfile (node_exporter textfile collector), empty disables it
+METRICS_TEXTFILE = os.getenv("METRICS_TEXTFILE", "")
+
+REPORT_INPUT_COLS = ["topic_id", "topic_title", "sender_id", "sender_username"]
 # ====================
 
 
-async def dump_yesterday_messages_and_member():
+def _telegram_client():
+    from telethon import TelegramClient
+
+    return TelegramClient(SESSION, API_ID, API_HASH)
+
+
+async def _open_chat(client):
+    """
+    Set up the client's shared rate limiter, then resolve TARGET_CHAT.
+    """
+    from ratelimit import get_limiter
+
+    limiter = get_limiter(
+        client, rate=TG_RPS, burst=TG_BURST, min_rate=TG_MIN_RPS, max_rate=TG_MAX_RPS
+    )
+    return await limiter.call(client.get_entity, TARGET_CHAT)
+
+
+async def _flush_topic(
+    client,
+    writer: MessageParquetWriter,
+    topic_id: int,
+    sender_cache,
+    unknown: set,
+    on_batch=None,
+    media=None,
+) -> None:
+    """
+    Resolve the topic's still-unknown senders in bulk, then write its
+    buffered rows with sender_username (and the hashes of media already
+    downloaded) filled in, and hand them to on_batch (e.g. the streaming
+    MySQL loader) if given.
+    """
+    from topics import resolve_usernames_bulk
+
+    if unknown:
+        await resolve_usernames_bulk(client, unknown, sender_cache)
+        unknown.clear()
+
+    def _username_for(sender_id):
+        username = sender_cache.get(sender_id)
+        return (
+            username
+            if username
+            else (str(sender_id) if sender_id is not None else None)
+        )
+
+    table = writer.flush_topic(
+        topic_id, _username_for, media.store.hash_for if media is not None else None
+    )
+    if on_batch is not None and table is not None:
+        await on_batch(table)
+
+
+async def _harvest_topic(
+    client,
+    t,
+    messages,
+    sender_cache: SenderCache,
+    writer: MessageParquetWriter,
+    on_batch=None,
+    media=None,
+) -> tuple[int, bool]:
+    """
+    Stream the messages of one topic into the writer, flushing every
+    HARVEST_FLUSH_ROWS rows. FloodWait is waited out (and the page retried)
+    by the rate limiter; on any other RPC error the topic keeps the rows
+    collected so far (completed=False).
+    With MEDIA_METADATA the media columns are filled, and media files are
+    handed to the media downloader (if given) without waiting for them.
+    Usernames come from the response entities; the rest are resolved in bulk
+    before each flush.
+    Return: (max message_id seen, completed)
+    """
+    from telethon.errors import RPCError
+    from media import media_info
+    from topics import username_from_message
+
+    title = getattr(t, "title", f"topic_{t.id}")
+    print(f"\n[i] Topic {t.id} — {title}")
+    unknown_senders = set()
+    max_message_id = n_messages = 0
+    completed = True
+    try:
+        async for msg in messages:
+            sender_id = getattr(msg, "sender_id", None)
+            if not username_from_message(msg, sender_cache):
+                unknown_senders.add(sender_id)
+            info = media_info(msg) if MEDIA_METADATA else None
+
+            writer.append(
+                t.id,
+                title,
+                msg.id,
+                (
+                    msg.date.replace(tzinfo=timezone.utc).isoformat()
+                    if msg.date.tzinfo is None
+                    else msg.date.isoformat()
+                ),
+                sender_id,
+                msg.message or "",
+                getattr(msg, "reply_to_msg_id", None),
+                info,
+            )
+            if info is not None and media is not None:
+                media.submit(info, msg, group=writer)
+            max_message_id = max(max_message_id, msg.id)
+            n_messages += 1
+            if writer.pending(t.id) >= HARVEST_FLUSH_ROWS:
+                await _flush_topic(
+                    client, writer, t.id, sender_cache, unknown_senders, on_batch, media
+                )
+    except RPCError as e:
+        completed = False
+        print(f"[!] Topic {t.id} stopped early: {e}")
+
+    await _flush_topic(
+        client, writer, t.id, sender_cache, unknown_senders, on_batch, media
+    )
+    if completed:
+        writer.mark_done(t.id)
+    metrics.count("messages_total", n_messages, topic_id=t.id)
+    if not completed:
+        metrics.count("topics_incomplete_total")
+    return max_message_id, completed
+
+
+def _sweep_stale_spills() -> None:
+    """
+    Remove checkpoints of crashed runs not resumed within SPILL_RETENTION_DAYS.
+    """
+    # spill directories sit next to the messages file (flat or hive) or run file
+    dirs = [OUT_DIR, OUT_DIR / "increments", *(OUT_DIR / "all_topics").glob("date=*")]
+    for out_dir in dirs:
+        for spill_dir in sweep_spill_dirs(out_dir, SPILL_RETENTION_DAYS * 86400):
+            print(f"[!] Removed stale checkpoint: {spill_dir}")
+
+
+def _open_sender_cache() -> SenderCache:
+    return SenderCache(
+        SENDER_CACHE_PATH,
+        ttl_s=SENDER_CACHE_TTL_DAYS * 86400,
+        max_size=SENDER_CACHE_MAX,
+    )
+
+
+async def _harvest_topics(
+    client,
+    topics,
+    make_messages,
+    writer: MessageParquetWriter,
+    on_batch=None,
+    sem: asyncio.Semaphore | None = None,
+    sender_cache: SenderCache | None = None,
+    media=None,
+) -> list[tuple[int, bool]]:
+    """
+    Run _harvest_topic over all topics with TOPIC_CONCURRENCY workers,
+    streaming rows into writer (and on_batch) and media files into the
+    media downloader, if given.
+    make_messages(t, offset_id) returns the message iterator of a topic,
+    starting below offset_id (0 = newest). Topics the writer's checkpoint
+    marks done are skipped, the others resume from their checkpoint.
+    sem / sender_cache can be shared between concurrent calls on the
+    same client (backfill); a sender_cache passed in is left open.
+    Return: (max message_id, completed) per topic, in the order of topics
+    """
+    own_cache = sender_cache is None
+    if own_cache:
+        sender_cache = _open_sender_cache()
+    sem = sem or asyncio.Semaphore(TOPIC_CONCURRENCY)
+
+    async def _worker(t):
+        if writer.is_done(t.id):
+            return 0, True
+        async with sem:
+            return await _harvest_topic(
+                client,
+                t,
+                make_messages(t, writer.resume_offset(t.id)),
+                sender_cache,
+                writer,
+                on_batch,
+                media,
+            )
+
+    if writer.resumed:
+        n_done = sum(writer.is_done(t.id) for t in topics)
+        print(f"[i] Resuming from checkpoint: {n_done} topic(s) already done")
+
+    if not own_cache:
+        return await asyncio.gather(*(_worker(t) for t in topics))
+
+    print(f"[i] Harvesting with {TOPIC_CONCURRENCY} concurrent topic(s)")
+    try:
+        with metrics.stage("harvest"):
+            per_topic = await asyncio.gather(*(_worker(t) for t in topics))
+    finally:
+        sender_cache.close()
+    print(f"[i] {sender_cache.stats_line()}")
+    _record_cache_stats(sender_cache)
+    return per_topic
+
+
+@asynccontextmanager
+async def _media_downloads(client):
+    """
+    Media downloader of a harvest (None unless MEDIA_DOWNLOAD) over the
+    store in MEDIA_DIR. Leaving the block waits for the queued downloads;
+    on an error they are cancelled.
+    """
+    if not MEDIA_DOWNLOAD:
+        yield None
+        return
+    from media import MediaDownloader, MediaStore
+
+    store = MediaStore(MEDIA_DIR)
+    media = MediaDownloader(
+        client,
+        store,
+        concurrency=MEDIA_DOWNLOAD_CONCURRENCY,
+        max_bytes=int(MEDIA_MAX_MB * 2**20),
+    )
+    try:
+        yield media
+    except BaseException:
+        media.cancel()
+        raise
+    else:
+        await media.close()
+        print(f"[i] {media.stats_line()}")
+    finally:
+        store.close()
+
+
+async def _close_messages(writer: MessageParquetWriter, media) -> int:
+    """
+    Close the messages parquet once the media downloads its rows need are
+    done, so that its media_sha256 covers them.
+    Return: rows written
+    """
+    if media is None:
+        return writer.close()
+    with metrics.stage("media_drain"):
+        await media.drain(writer)
+    return writer.close(media_hash_for=media.store.hash_for)
+
+
+def _record_cache_stats(sender_cache: SenderCache) -> None:
+    metrics.set_gauge("sender_cache_hits", sender_cache.hits)
+    metrics.set_gauge("sender_cache_misses", sender_cache.misses)
+    metrics.set_gauge("sender_cache_size", len(sender_cache))
+    total = sender_cache.hits + sender_cache.misses
+    metrics.set_gauge(
+        "sender_cache_hit_ratio", sender_cache.hits / total if total else 0.0
+    )
+
+
+def _index_for_search(messages_path: Path, day_str: str, chat_id: int | None) -> None:
+    """
+    Add one day's messages parquet of chat_id to the search index
+    (SEARCH_INDEX=1); a day indexed again replaces its previous rows.
+    """
+    if not SEARCH_INDEX or not messages_path.exists():
+        return
+    index = SearchIndex(SEARCH_INDEX_PATH)
+    try:
+        n = index.index_parquet(
+            messages_path,
+            datetime.strptime(day_str, "%Y%m%d").date().isoformat(),
+            chat_id,
+        )
+    finally:
+        index.close()
+    print(f"[✓] Indexed {n} message(s) for search: {SEARCH_INDEX_PATH}")
+
+
+def _save_rolling_report(end_day: date) -> None:
+    if not ROLLING_REPORT_DAYS:
+        return
+    rolling_path = build_rolling_report_parquet(
+        OUT_DIR, end_day, layout=OUT_LAYOUT, windows=ROLLING_REPORT_DAYS
+    )
+    if rolling_path is not None:
+        print(f"[✓] Saved rolling report: {rolling_path}")
+
+
+def _save_reports(
+    topics,
+    messages_path: Path,
+    now_utc: datetime,
+    rolling: bool = True,
+    chat_id: int | None = None,
+) -> None:
+    """
+    Build yesterday's report from the messages parquet (when it exists),
+    then the rolling report over the archive ending yesterday.
+    """
+    if messages_path.exists():
+        # the report only needs the id/name/reply columns, never the message
+        # text (titles/usernames as categoricals, so it never hashes strings)
+        df = pd.read_parquet(
+            messages_path,
+            columns=REPORT_INPUT_COLS + THREAD_INPUT_COLS,
+            read_dictionary=["topic_title", "sender_username"],
+        )
+
+        # === NEW: generate ad-hoc report (3 task → 1 parquet)
+        report_path = build_yesterday_report_parquet(
+            df_messages=df,
+            out_dir=OUT_DIR,
+            now_utc=now_utc,
+            all_topics=topics,  # give all topics so totals are correct
+            chat_id=chat_id,
+            out_path=dataset_path(
+                OUT_DIR, "report", yday_label_str(now_utc), OUT_LAYOUT
+            ),
+            # mergeable partial aggregate, read by the rolling report
+            state_path=dataset_path(
+                OUT_DIR, "report_state", yday_label_str(now_utc), OUT_LAYOUT
+            ),
+            # per-message reply thread (parent, root, depth, thread size)
+            threads_path=dataset_path(
+                OUT_DIR, "threads", yday_label_str(now_utc), OUT_LAYOUT
+            ),
+        )
+        print(f"[✓] Saved daily report: {report_path}")
+
+    if rolling:
+        _save_rolling_report(
+            datetime.strptime(yday_label_str(now_utc), "%Y%m%d").date()
+        )
+
+
+async def _save_daily_outputs(
+    client, chat, topics, messages_path: Path, now_utc: datetime
+) -> None:
+    """
+    Build yesterday's reports from the messages parquet (when it exists)
+    and write the member count parquet.
+    """
+    with metrics.stage("reports"):
+        _save_reports(topics, messages_path, now_utc, chat_id=getattr(chat, "id", None))
+    await _save_member_count(client, chat, now_utc)
+
+
+async def _save_member_count(client, chat, now_utc: datetime) -> None:
+    from members import fetch_member_count
+
+    members_count = await fetch_member_count(client, chat)
+    df_members = pd.DataFrame(
+        [
+            {
+                "date_label_jkt": (now_utc + timedelta(hours=7) - timedelta(days=1))
+                .date()
+                .isoformat(),
+                "chat_id": getattr(chat, "id", None),
+                "chat_title": getattr(chat, "title", None),
+                "members_count": members_count,
+                "taken_at_utc": now_utc.isoformat(),
+            }
+        ]
+    )
+
+    members_path = dataset_path(
+        OUT_DIR, "member_count", yday_label_str(now_utc), OUT_LAYOUT
+    )
+    members_path.parent.mkdir(parents=True, exist_ok=True)
+    df_members.to_parquet(members_path, index=False)
+    metrics.count_bytes(members_path, "member_count")
+    print(f"[✓] Saved member count: {members_path} | members: {members_count}")
+
+
+async def dump_yesterday_messages_and_member(on_batch=None):
+    """
+    Daily mode: harvest yesterday's messages of all active topics into the
+    messages parquet, then write the report and member count.
+    on_batch(table) is awaited for every flushed batch of rows.
+    """
+    from ratelimit import get_limiter
+    from topics import (
+        fetch_all_topics_with_activity,
+        filter_active_topics,
+        iter_topic_messages_yesterday,
+    )
+
+    _sweep_stale_spills()
     now_utc = datetime.now(timezone.utc)
     start_yday_utc, start_today_utc = jakarta_bounds_yesterday_utc(now_utc)
     print(
         f"[i] JKT (UTC): {start_yday_utc.isoformat()} → {start_today_utc.isoformat()}"
     )
 
-    async with TelegramClient(SESSION, API_ID, API_HASH) as client:
-        chat = await client.get_entity(TARGET_CHAT)
+    async with _telegram_client() as client:
+        chat = await _open_chat(client)
 
         print("[i] Get topics…")
-        topics = await fetch_all_topics(client, chat)
+        topics, last_activity = await fetch_all_topics_with_activity(client, chat)
         print(f"[i] Found {len(topics)} topic.")
 
+        # skip dormant topics: latest message before yesterday's window
+        active = filter_active_topics(topics, last_activity, start_yday_utc)
+        print(f"[i] {len(active)} active topic(s), {len(topics) - len(active)} skipped")
+
         # ===== Dump yesterday messages from all topics =====
-        all_rows = []
-        sender_cache = {}
-
-        for t in topics:
-            title = getattr(t, "title", f"topic_{t.id}")
-            print(f"\n[i] Topic {t.id} — {title}")
-            try:
-                async for msg in iter_topic_messages_yesterday(
-                    client, chat, t.id, start_yday_utc, start_today_utc
-                ):
-                    sender_id = getattr(msg, "sender_id", None)
-                    username = await resolve_username(client, sender_id, sender_cache)
-                    sender_username = (
-                        username
-                        if username
-                        else (str(sender_id) if sender_id is not None else None)
-                    )
+        yday_str = yday_label_str(now_utc)
+        out_path = dataset_path(OUT_DIR, "all_topics", yday_str, OUT_LAYOUT)
+        writer = MessageParquetWriter(
+            out_path,
+            row_group_size=PARQUET_ROW_GROUP_SIZE,
+            chat_id=getattr(chat, "id", None),
+            compact=PARQUET_COMPACT,
+        )
+        async with _media_downloads(client) as media:
+            await _harvest_topics(
+                client,
+                active,
+                lambda t, offset_id: iter_topic_messages_yesterday(
+                    client, chat, t.id, start_yday_utc, start_today_utc, offset_id
+                ),
+                writer,
+                on_batch,
+                media=media,
+            )
+            total = await _close_messages(writer, media)
+        if total:
+            print(f"[✓] Saved: {out_path} | total rows: {total}")
+            _index_for_search(out_path, yday_str, getattr(chat, "id", None))
 
-                    all_rows.append(
-                        {
-                            "topic_id": t.id,
-                            "topic_title": title,
-                            "message_id": msg.id,
-                            "date_utc": (
-                                msg.date.replace(tzinfo=timezone.utc).isoformat()
-                                if msg.date.tzinfo is None
-                                else msg.date.isoformat()
-                            ),
-                            "sender_id": sender_id,
-                            "sender_username": sender_username,
-                            "text": msg.message or "",
-                            "reply_to_msg_id": getattr(msg, "reply_to_msg_id", None),
-                        }
-                    )
-            except FloodWaitError as e:
-                wait_s = e.seconds + 1
-                print(f"[!] FloodWait {wait_s}s at topic {t.id}, waiting")
-                await asyncio.sleep(wait_s)
-
-        if all_rows:
-            df = pd.DataFrame(all_rows)
-            df.drop_duplicates(subset=["topic_id", "message_id"], inplace=True)
-            df.sort_values(["topic_id", "message_id"], inplace=True)
-
-            yday_str = yday_label_str(now_utc)
-            out_path = OUT_DIR / f"yesterday_all_topics_{yday_str}.parquet"
-            df.to_parquet(out_path, index=False)
-            print(f"[✓] Saved: {out_path} | total rows: {len(df)}")
-
-            # === NEW: generate ad-hoc report (3 task → 1 parquet)
-            report_path = build_yesterday_report_parquet(
-                df_messages=df,
-                out_dir=OUT_DIR,
-                now_utc=now_utc,
-                all_topics=topics,  # give all topics so totals are correct
+        await _save_daily_outputs(client, chat, topics, out_path, now_utc)
+        print(f"[i] {get_limiter(client).stats_line()}")
+
+
+def _has_new_messages(t, marks: dict, last_activity: dict, since_utc) -> bool:
+    """
+    Incremental pre-filter: a marked topic has news if its top message is
+    above the mark; an unmarked one if it was active since since_utc.
+    """
+    top_message = getattr(t, "top_message", None)
+    if t.id in marks and top_message is not None:
+        return top_message > marks[t.id]
+    from topics import filter_active_topics
+
+    return bool(filter_active_topics([t], last_activity, since_utc))
+
+
+async def dump_incremental_messages_and_member() -> bool:
+    """
+    Incremental mode: fetch only messages above each topic's high-water mark,
+    store them as increments, and build yesterday's parquet + report from the
+    increments on the first run after Jakarta midnight in which every topic
+    was read to the end.
+    Return: True if yesterday's outputs were built in this run
+    """
+    from ratelimit import get_limiter
+    from topics import fetch_all_topics_with_activity, iter_topic_messages_since
+
+    now_utc = datetime.now(timezone.utc)
+    start_yday_utc, _ = jakarta_bounds_yesterday_utc(now_utc)
+    marks = load_high_water_marks(HWM_STATE_PATH)
+    _sweep_stale_spills()
+    # run files of a crashed run are never picked up (labels are unique)
+    n_stale = sweep_stale_runs(OUT_DIR)
+    if n_stale:
+        print(f"[i] Removed {n_stale} stale run file(s) from {OUT_DIR / 'increments'}")
+
+    async with _telegram_client() as client:
+        chat = await _open_chat(client)
+
+        print("[i] Get topics…")
+        topics, last_activity = await fetch_all_topics_with_activity(client, chat)
+        print(f"[i] Found {len(topics)} topic.")
+
+        active = [
+            t
+            for t in topics
+            if _has_new_messages(t, marks, last_activity, start_yday_utc)
+        ]
+        print(f"[i] {len(active)} active topic(s), {len(topics) - len(active)} skipped")
+
+        run_label = now_utc.strftime("%Y%m%dT%H%M%S")
+        run_path = OUT_DIR / "increments" / f"_run_{run_label}.parquet"
+        run_path.parent.mkdir(parents=True, exist_ok=True)
+        writer = MessageParquetWriter(
+            run_path,
+            row_group_size=PARQUET_ROW_GROUP_SIZE,
+            chat_id=getattr(chat, "id", None),
+        )
+        async with _media_downloads(client) as media:
+            per_topic = await _harvest_topics(
+                client,
+                active,
+                lambda t, offset_id: iter_topic_messages_since(
+                    client, chat, t.id, marks.get(t.id, 0), start_yday_utc, offset_id
+                ),
+                writer,
+                media=media,
             )
-            print(f"[✓] Saved daily report: {report_path}")
-
-        members_count = await fetch_member_count(client, chat)
-        df_members = pd.DataFrame(
-            [
-                {
-                    "date_label_jkt": (now_utc + timedelta(hours=7) - timedelta(days=1))
-                    .date()
-                    .isoformat(),
-                    "chat_id": getattr(chat, "id", None),
-                    "chat_title": getattr(chat, "title", None),
-                    "members_count": members_count,
-                    "taken_at_utc": now_utc.isoformat(),
-                }
-            ]
+            total = await _close_messages(writer, media)
+        if total:
+            for p in write_increment(OUT_DIR, read_messages_frame(run_path), run_label):
+                print(f"[✓] Saved increment: {p}")
+            run_path.unlink()
+
+        # advance marks only for topics read to the end, after the increment is on disk
+        for t, (max_message_id, completed) in zip(active, per_topic):
+            if completed and max_message_id:
+                marks[t.id] = max(marks.get(t.id, 0), max_message_id)
+        save_high_water_marks(HWM_STATE_PATH, marks)
+        print(f"[i] Fetched {total} new message(s) since last run")
+        print(f"[i] {get_limiter(client).stats_line()}")
+
+        yday_str = yday_label_str(now_utc)
+        out_path = dataset_path(OUT_DIR, "all_topics", yday_str, OUT_LAYOUT)
+        if out_path.exists():
+            print(f"[i] Daily outputs for {yday_str} already built, skip")
+            return False
+        # this run started after midnight: a topic read to the end has its
+        # mark past yesterday; one that stopped early may miss yesterday's tail
+        n_incomplete = sum(not completed for _, completed in per_topic)
+        if n_incomplete:
+            print(
+                f"[!] Daily outputs for {yday_str} not built: {n_incomplete} "
+                f"topic(s) incomplete, the next run retries"
+            )
+            return False
+
+        df = collect_increments(OUT_DIR, yday_str)
+        # a day without messages gets an empty file, so it is built only once
+        write_messages_table(
+            messages_table(df),
+            out_path,
+            compact=PARQUET_COMPACT,
+            row_group_size=PARQUET_ROW_GROUP_SIZE,
         )
+        print(f"[✓] Saved: {out_path} | total rows: {len(df)}")
+        # the daily parquet now holds the day: its increments are redundant
+        drop_increments(OUT_DIR, yday_str)
+        _index_for_search(out_path, yday_str, getattr(chat, "id", None))
+        await _save_daily_outputs(client, chat, topics, out_path, now_utc)
+        return True
+
 
-        members_path = (
-            OUT_DIR / f"yesterday_member_count_{yday_label_str(now_utc)}.parquet"
+async def backfill_messages(first: date, last: date) -> list[str]:
+    """
+    Backfill mode: harvest every Jakarta day from first to last (both
+    included) and build its report, BACKFILL_CONCURRENCY days at a time.
+    All days share one client (and so its rate limiter), topic semaphore
+    and sender cache, so the RPC rate stays that of a single daily run. Days whose
+    messages parquet already exists are skipped (a day without messages gets
+    an empty one); a day where a topic stopped early keeps its checkpoint
+    instead, and the next run resumes it. Member counts are not backfilled
+    (only the current count is available).
+    Return: YYYYMMDD labels of the days harvested
+    """
+    from ratelimit import get_limiter
+    from topics import (
+        fetch_all_topics_with_activity,
+        filter_active_topics,
+        iter_topic_messages_yesterday,
+    )
+
+    _sweep_stale_spills()
+    days = jakarta_days(first, last)
+    print(f"[i] Backfill {len(days)} day(s): {first.isoformat()} → {last.isoformat()}")
+
+    async with _telegram_client() as client:
+        chat = await _open_chat(client)
+
+        print("[i] Get topics…")
+        topics, last_activity = await fetch_all_topics_with_activity(client, chat)
+        print(f"[i] Found {len(topics)} topic.")
+
+        sender_cache = _open_sender_cache()
+        topic_sem = asyncio.Semaphore(TOPIC_CONCURRENCY)
+        day_sem = asyncio.Semaphore(BACKFILL_CONCURRENCY)
+        incomplete: list[str] = []
+
+        async def _backfill_day(day: date):
+            day_str = day_label_str(day)
+            out_path = dataset_path(OUT_DIR, "all_topics", day_str, OUT_LAYOUT)
+            if out_path.exists():
+                print(f"[i] {day_str} already harvested, skip")
+                return None
+            start_utc, end_utc = jakarta_day_bounds_utc(day)
+            active = filter_active_topics(topics, last_activity, start_utc)
+            async with day_sem:
+                print(f"[i] Backfill {day_str}: {len(active)} active topic(s)")
+                writer = MessageParquetWriter(
+                    out_path,
+                    row_group_size=PARQUET_ROW_GROUP_SIZE,
+                    chat_id=getattr(chat, "id", None),
+                    compact=PARQUET_COMPACT,
+                )
+                per_topic = await _harvest_topics(
+                    client,
+                    active,
+                    lambda t, offset_id: iter_topic_messages_yesterday(
+                        client, chat, t.id, start_utc, end_utc, offset_id
+                    ),
+                    writer,
+                    sem=topic_sem,
+                    sender_cache=sender_cache,
+                    media=media,
+                )
+                if not all(completed for _, completed in per_topic):
+                    # writer left open: its checkpoint survives, and a rerun
+                    # resumes the topics that stopped early
+                    print(f"[!] Backfill {day_str} incomplete, rerun to resume it")
+                    metrics.count("backfill_days_incomplete_total")
+                    incomplete.append(day_str)
+                    return None
+                total = await _close_messages(writer, media)
+                if total:
+                    print(f"[✓] Saved: {out_path} | total rows: {total}")
+                else:
+                    # an empty file marks the day as harvested
+                    write_messages_table(
+                        MESSAGE_SCHEMA.empty_table(), out_path, compact=PARQUET_COMPACT
+                    )
+                    print(f"[i] No messages on {day_str}: {out_path}")
+            await asyncio.to_thread(
+                _index_for_search, out_path, day_str, getattr(chat, "id", None)
+            )
+            # end of the Jakarta day == "now" of the run that would report it
+            await asyncio.to_thread(
+                _save_reports,
+                topics,
+                out_path,
+                end_utc,
+                False,
+                getattr(chat, "id", None),
+            )
+            return day_str
+
+        print(
+            f"[i] Harvesting {BACKFILL_CONCURRENCY} day(s) / "
+            f"{TOPIC_CONCURRENCY} topic(s) at once"
         )
-        df_members.to_parquet(members_path, index=False)
-        print(f"[✓] Saved member count: {members_path} | members: {members_count}")
+        try:
+            async with _media_downloads(client) as media:
+                with metrics.stage("harvest"):
+                    done = await asyncio.gather(*(_backfill_day(d) for d in days))
+        finally:
+            sender_cache.close()
+        print(f"[i] {sender_cache.stats_line()}")
+        _record_cache_stats(sender_cache)
+        print(f"[i] {get_limiter(client).stats_line()}")
+
+    if incomplete:
+        print(f"[!] {len(incomplete)} day(s) incomplete: {sorted(incomplete)}")
+    # rolling windows only once every day of the range is on disk
+    done = [d for d in done if d is not None]
+    for day_str in done:
+        _save_rolling_report(datetime.strptime(day_str, "%Y%m%d").date())
+    return done
 
 
 # === async loader MySQL ===
-async def load_yesterday_parquets_into_mysql():
-    now_utc = datetime.now(timezone.utc)
-    yday_str = yday_label_str(now_utc)
+def _mysql_pool(pool_size: int):
+    from db import get_pool
+
+    return get_pool(
+        mysql_host=MYSQL_HOST,
+        mysql_user=MYSQL_USER,
+        mysql_password=MYSQL_PASSWORD,
+        mysql_database=MYSQL_DATABASE,
+        mysql_port=MYSQL_PORT,
+        pool_size=pool_size,
+        allow_local_infile=MYSQL_LOAD_METHOD == "load_data",
+    )
 
-    messages_parquet = OUT_DIR / f"yesterday_all_topics_{yday_str}.parquet"
-    member_parquet = OUT_DIR / f"yesterday_member_count_{yday_str}.parquet"
-    report_parquet = OUT_DIR / f"yesterday_report_{yday_str}.parquet"
+
+def _prepare_mysql(pool, yday_str: str) -> None:
+    """
+    Create / migrate tables and the partition for the day being loaded.
+    """
+    from db import ensure_partitions, ensure_tables_exist
+
+    conn = pool.get_connection()
+    try:
+        ensure_tables_exist(
+            conn, partitioned=MYSQL_PARTITIONED, fulltext=MYSQL_FULLTEXT
+        )
+        if MYSQL_PARTITIONED:
+            ensure_partitions(
+                conn,
+                "telegram_messages_yday",
+                datetime.strptime(yday_str, "%Y%m%d").date(),
+            )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+async def load_yesterday_parquets_into_mysql(skip_tables=()):
+    """
+    Load yesterday's parquet files into MySQL. Tables in skip_tables
+    (already loaded by the streaming pipeline) are left out.
+    """
+    yday_str = yday_label_str(datetime.now(timezone.utc))
+    return await load_day_parquets_into_mysql(yday_str, skip_tables)
+
+
+async def load_day_parquets_into_mysql(yday_str: str, skip_tables=()):
+    """
+    Load the parquet files of one Jakarta day (YYYYMMDD) into MySQL.
+    """
+    from db import load_parquet_to_mysql_parallel
+
+    messages_parquet = dataset_path(OUT_DIR, "all_topics", yday_str, OUT_LAYOUT)
+    member_parquet = dataset_path(OUT_DIR, "member_count", yday_str, OUT_LAYOUT)
+    report_parquet = dataset_path(OUT_DIR, "report", yday_str, OUT_LAYOUT)
 
     paths = {
         "telegram_messages_yday": (
@@ -146,80 +867,201 @@ async def load_yesterday_parquets_into_mysql():
         "telegram_yday_report": report_parquet if report_parquet.exists() else None,
     }
 
+    def _load_table(pool, table_name: str, add_date_label: bool, streams: int):
+        path = paths[table_name]
+        if not path:
+            print(f"[i] Skip {table_name}: parquet not found")
+            return table_name, None
+        inserted = load_parquet_to_mysql_parallel(
+            pool,
+            str(path),
+            table_name,
+            add_date_label,
+            "date_label_jkt",
+            streams=streams,
+            method=MYSQL_LOAD_METHOD,
+        )
+        print(f"[✓] MySQL inserted {inserted} rows -> {table_name}")
+        return table_name, inserted
+
     def _sync_load():
-        results = {}
-        conn = None
-        try:
-            conn = get_conn(
-                mysql_host=MYSQL_HOST,
-                mysql_user=MYSQL_USER,
-                mysql_password=MYSQL_PASSWORD,
-                mysql_database=MYSQL_DATABASE,
-                mysql_port=MYSQL_PORT,
-            )
-            ensure_tables_exist(conn)
-
-            if paths["telegram_messages_yday"]:
-                inserted = load_parquet_to_mysql(
-                    conn,
-                    str(paths["telegram_messages_yday"]),
-                    "telegram_messages_yday",
-                    True,
-                    "date_label_jkt",
-                )
-                results["telegram_messages_yday"] = inserted
-                print(f"[✓] MySQL inserted {inserted} rows -> telegram_messages_yday")
-            else:
-                print("[i] Skip messages: parquet not found")
-
-            if paths["telegram_member_count_daily"]:
-                inserted = load_parquet_to_mysql(
-                    conn,
-                    str(paths["telegram_member_count_daily"]),
-                    "telegram_member_count_daily",
-                    False,
-                    "date_label_jkt",
-                )
-                results["telegram_member_count_daily"] = inserted
-                print(
-                    f"[✓] MySQL inserted {inserted} rows -> telegram_member_count_daily"
-                )
-            else:
-                print("[i] Skip member_count: parquet not found")
-
-            if paths["telegram_yday_report"]:
-                inserted = load_parquet_to_mysql(
-                    conn,
-                    str(paths["telegram_yday_report"]),
-                    "telegram_yday_report",
-                    False,
-                    "date_label_jkt",
-                )
-                results["telegram_yday_report"] = inserted
-                print(f"[✓] MySQL inserted {inserted} rows -> telegram_yday_report")
-            else:
-                print("[i] Skip report: parquet not found")
+        # messages get MYSQL_LOAD_STREAMS connections, the small tables one each
+        pool = _mysql_pool(MYSQL_LOAD_STREAMS + 2)
+        _prepare_mysql(pool, yday_str)
 
-            return results
-        finally:
-            try:
-                if conn is not None:
-                    conn.close()
-            except Exception:
-                pass
+        jobs = [
+            job
+            for job in (
+                ("telegram_messages_yday", True, MYSQL_LOAD_STREAMS),
+                ("telegram_member_count_daily", False, 1),
+                ("telegram_yday_report", False, 1),
+            )
+            if job[0] not in skip_tables
+        ]
+        # independent tables load at the same time
+        with metrics.stage("mysql_load"), ThreadPoolExecutor(
+            max_workers=len(jobs)
+        ) as ex:
+            done = list(ex.map(lambda job: _load_table(pool, *job), jobs))
+        return {table_name: n for table_name, n in done if n is not None}
 
     return await asyncio.to_thread(_sync_load)
 
 
+async def _dump_with_streaming_load():
+    """
+    Pipeline mode: messages go from the harvest loop through a bounded
+    queue into MySQL while scraping continues; parquet is still written.
+    Return: rows streamed, or None if the streaming load failed
+    """
+    from pipeline import MySQLStreamLoader
+
+    yday_str = yday_label_str(datetime.now(timezone.utc))
+    pool = await asyncio.to_thread(_mysql_pool, MYSQL_LOAD_STREAMS)
+    await asyncio.to_thread(_prepare_mysql, pool, yday_str)
+    loader = MySQLStreamLoader(
+        pool,
+        "telegram_messages_yday",
+        date_label=datetime.strptime(yday_str, "%Y%m%d").date().isoformat(),
+        streams=MYSQL_LOAD_STREAMS,
+        max_pending=PIPELINE_MAX_PENDING,
+        method=MYSQL_LOAD_METHOD,
+    )
+    try:
+        await dump_yesterday_messages_and_member(on_batch=loader.put)
+    finally:
+        streamed = await loader.close()
+    if streamed is None:
+        print("[!] Streaming load failed, messages will be loaded from parquet")
+    else:
+        print(f"[✓] MySQL streamed {streamed} rows -> telegram_messages_yday")
+    return streamed
+
+
+async def harvest_and_load(mode: str = "daily", load: bool = True) -> None:
+    """
+    One harvest run, "daily", "incremental" or "pipeline" (daily with
+    messages streamed into MySQL), then the MySQL load of yesterday's
+    parquets unless load is False (pipeline then runs as daily).
+    """
+    streamed = None
+    # 1) dump yesterday messages + member count ke parquet
+    if mode == "incremental":
+        if not await dump_incremental_messages_and_member():
+            return
+    elif mode == "pipeline" and load:
+        streamed = await _dump_with_streaming_load()
+    else:
+        await dump_yesterday_messages_and_member()
+    if not load:
+        return
+    # 2) load parquet to MySQL (messages are already in when streamed, but
+    # rows streamed before their media was downloaded lack media_sha256:
+    # with MEDIA_DOWNLOAD the upsert of the parquet fills it in)
+    loaded = streamed is not None and not MEDIA_DOWNLOAD
+    skip = {"telegram_messages_yday"} if loaded else set()
+    results = await load_yesterday_parquets_into_mysql(skip_tables=skip)
+    if loaded:
+        results["telegram_messages_yday"] = streamed
+    print(f"[✓] MySQL load results: {results}")
+
+
+async def backfill_and_load(first: date, last: date) -> None:
+    """
+    Backfill first..last, then load every harvested day into MySQL.
+    """
+    days = await backfill_messages(first, last)
+    for day_str in days:
+        results = await load_day_parquets_into_mysql(day_str)
+        print(f"[✓] MySQL load results {day_str}: {results}")
+
+
+async def dump_member_count() -> None:
+    """
+    Write only the member count parquet (labelled yesterday, as in a
+    daily run).
+    """
+    from ratelimit import get_limiter
+
+    async with _telegram_client() as client:
+        chat = await _open_chat(client)
+        await _save_member_count(client, chat, datetime.now(timezone.utc))
+        print(f"[i] {get_limiter(client).stats_line()}")
+
+
+def rebuild_reports(day: date) -> None:
+    """
+    Rebuild one Jakarta day's report (plus state and threads) and the
+    rolling report ending that day from the messages parquet on disk,
+    without Telegram. The topic list is not known offline, so
+    topics_count counts the topics that have messages.
+    """
+    messages_path = dataset_path(OUT_DIR, "all_topics", day_label_str(day), OUT_LAYOUT)
+    if not messages_path.exists():
+        print(f"[!] No messages parquet for {day.isoformat()}: {messages_path}")
+    chat_id = None
+    if messages_path.exists() and "chat_id" in pq.read_schema(messages_path).names:
+        chat_ids = pd.read_parquet(messages_path, columns=["chat_id"])["chat_id"]
+        chat_ids = chat_ids.dropna()
+        chat_id = int(chat_ids.iloc[0]) if len(chat_ids) else None
+    # end of the Jakarta day == "now" of the run that reported it
+    _, end_utc = jakarta_day_bounds_utc(day)
+    with metrics.stage("reports"):
+        _save_reports(None, messages_path, end_utc, chat_id=chat_id)
+
+
+def run_job(job, mode: str, startup_s: float | None = None) -> None:
+    """
+    Run one job (a coroutine) with fresh metrics, then append its run
+    summary. startup_s, the imports cli.py did before the job, is kept as
+    the startup_seconds gauge.
+    """
+    metrics.reset()
+    metrics.set_info(mode=mode, chat=TARGET_CHAT, layout=OUT_LAYOUT)
+    if startup_s is not None:
+        metrics.set_gauge("startup_seconds", startup_s)
+    status = "failed"
+    try:
+        asyncio.run(job)
+        status = "ok"
+    finally:
+        _write_run_summary(status)
+
+
 def main():
+    mode = "pipeline" if PIPELINE_MODE and HARVEST_MODE == "daily" else HARVEST_MODE
+
     async def _run():
-        # 1) dump yesterday messages + member count ke parquet
-        await dump_yesterday_messages_and_member()
-        # 2) load parquet to MySQL
-        results = await load_yesterday_parquets_into_mysql()
-        print(f"[✓] MySQL load results: {results}")
+        if mode == "backfill":
+            await backfill_and_load(
+                date.fromisoformat(BACKFILL_FROM),
+                date.fromisoformat(BACKFILL_TO or BACKFILL_FROM),
+            )
+        else:
+            await harvest_and_load(mode)
+
+    run_job(_run(), mode)
 
-    asyncio.run(_run())
+
+def _write_run_summary(status: str) -> None:
+    """
+    Append the run's metrics to RUN_SUMMARY_PATH (and METRICS_TEXTFILE).
+    """
+    metrics.set_info(status=status)
+    try:
+        summary = metrics.write_summary(RUN_SUMMARY_PATH)
+        if METRICS_TEXTFILE:
+            metrics.write_prometheus(Path(METRICS_TEXTFILE))
+    except OSError as e:
+        print(f"[!] Run summary not written: {e}")
+        return
+    stages = ", ".join(
+        f"{name} {s['seconds']:.1f}s"
+        for name, s in summary["stages"].items()
+        if not name.startswith("rpc{")
+    )
+    print(f"[i] Run {status} in {summary['wall_s']:.1f}s | {stages}")
+    print(f"[✓] Saved run summary: {RUN_SUMMARY_PATH}")
 
 
 if __name__ == "__main__":
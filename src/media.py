@@ -0,0 +1,253 @@
+import asyncio
+import hashlib
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional, Tuple
+
+import metrics
+from ratelimit import get_limiter
+
+# Telethon Message shortcuts of document kinds, most specific first
+_DOCUMENT_KINDS = ("sticker", "gif", "video_note", "voice", "video", "audio")
+
+# read size while hashing a downloaded file
+_HASH_CHUNK = 1 << 20
+
+
+class MediaInfo(NamedTuple):
+    kind: str
+    file_id: int
+    size: Optional[int]
+    mime_type: Optional[str]
+
+
+def media_info(msg) -> Optional[MediaInfo]:
+    """
+    Kind, Telegram file id, size and MIME type of a message's photo or
+    document (videos, voice notes, stickers, ... are documents).
+    Return: None for messages without media of their own (text, polls,
+    link previews)
+    """
+    if getattr(msg, "web_preview", None) is not None:
+        return None
+    photo = getattr(msg, "photo", None)
+    if photo is not None:
+        size = getattr(getattr(msg, "file", None), "size", None)
+        return MediaInfo("photo", photo.id, size, "image/jpeg")
+    document = getattr(msg, "document", None)
+    if document is None:
+        return None
+    kind = next(
+        (k for k in _DOCUMENT_KINDS if getattr(msg, k, None) is not None), "document"
+    )
+    return MediaInfo(
+        kind,
+        document.id,
+        getattr(document, "size", None),
+        getattr(document, "mime_type", None),
+    )
+
+
+class MediaStore:
+    """
+    Content-addressed store of downloaded media: every file is kept once,
+    as <root>/<sha256[:2]>/<sha256>, whatever file ids it was posted under.
+    A SQLite index maps Telegram file id -> sha256 (plus size and MIME
+    type), so media already stored is never downloaded again.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        # several processes (multi-chat runs) may share one store
+        self._conn = sqlite3.connect(str(self.root / "index.sqlite"), timeout=60)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS media (
+              file_id INTEGER PRIMARY KEY,
+              sha256 TEXT NOT NULL,
+              size INTEGER,
+              mime_type TEXT,
+              stored_at REAL
+            )
+            """)
+        self._hashes = dict(self._conn.execute("SELECT file_id, sha256 FROM media"))
+
+    def __contains__(self, file_id) -> bool:
+        return file_id in self._hashes
+
+    def hash_for(self, file_id) -> Optional[str]:
+        return self._hashes.get(file_id)
+
+    def path_for(self, sha256: str) -> Path:
+        return self.root / sha256[:2] / sha256
+
+    def put(self, path: Path) -> Tuple[str, bool]:
+        """
+        Hash a downloaded file and move it into the store (file system work
+        only, safe to run in a worker thread).
+        Return: (sha256, stored), stored False when that content was
+        already there (the file is then deleted)
+        """
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(_HASH_CHUNK), b""):
+                h.update(chunk)
+        sha256 = h.hexdigest()
+        dest = self.path_for(sha256)
+        if dest.exists():
+            os.unlink(path)
+            return sha256, False
+        dest.parent.mkdir(exist_ok=True)
+        os.replace(path, dest)
+        return sha256, True
+
+    def record(self, info: MediaInfo, sha256: str, size: int) -> None:
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO media VALUES (?, ?, ?, ?, ?)",
+                (info.file_id, sha256, size, info.mime_type, time.time()),
+            )
+        self._hashes[info.file_id] = sha256
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class MediaDownloader:
+    """
+    Download pipeline next to the harvest: submit() only queues a file, so
+    the message loop never waits on a download; `concurrency` worker tasks
+    fetch queued files through the client's rate limiter and hash / move
+    them into the store in a worker thread.
+    Files already stored or submitted in this run (same file id) are not
+    queued again, and a new file id whose content is already stored is
+    dropped after download, so bandwidth scales with unique file ids and
+    disk with unique content. Files over max_bytes (0 = no limit) are not
+    downloaded; their metadata is still recorded.
+    Files are submitted for a group (e.g. one day's messages writer), and
+    drain(group) waits only for the downloads that group needs, so
+    concurrently harvested days do not wait on each other's media.
+    """
+
+    def __init__(self, client, store: MediaStore, concurrency: int, max_bytes: int):
+        self.client = client
+        self.store = store
+        self.max_bytes = max_bytes
+        self.downloaded = 0
+        self.deduped = 0
+        self.skipped = 0
+        self.failed = 0
+        self.bytes_downloaded = 0
+        self._submitted = set()
+        # file id -> future done when its download ends (in flight only)
+        self._pending: Dict[int, asyncio.Future] = {}
+        # group -> file ids its drain() waits for
+        self._groups: Dict[object, set] = {}
+        self._tmp_dir = store.root / "_tmp"
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._workers = [
+            asyncio.create_task(self._work()) for _ in range(max(1, concurrency))
+        ]
+
+    def submit(self, info: MediaInfo, msg, group=None) -> None:
+        """
+        Queue the media of msg for download, unless it is known already;
+        drain(group) waits for it (also when another group queued it).
+        """
+        if info.file_id in self._pending:
+            self._groups.setdefault(group, set()).add(info.file_id)
+        if info.file_id in self._submitted or info.file_id in self.store:
+            self.deduped += 1
+            metrics.count("media_dedup_total", by="file_id")
+            return
+        self._submitted.add(info.file_id)
+        if self.max_bytes and (info.size or 0) > self.max_bytes:
+            self.skipped += 1
+            metrics.count("media_skipped_total", reason="size")
+            return
+        media = msg.photo if info.kind == "photo" else msg.document
+        self._pending[info.file_id] = asyncio.get_running_loop().create_future()
+        self._groups.setdefault(group, set()).add(info.file_id)
+        self._queue.put_nowait((info, media))
+
+    async def _work(self) -> None:
+        limiter = get_limiter(self.client)
+        while True:
+            item = await self._queue.get()
+            try:
+                if item is None:
+                    return
+                await self._download(limiter, *item)
+            except Exception as e:
+                # RPC (e.g. expired file reference) or disk errors: the
+                # metadata row stays, without a content hash
+                self.failed += 1
+                metrics.count("media_failed_total")
+                print(f"[!] Media {item[0].file_id} not downloaded: {e}")
+            finally:
+                if item is not None:
+                    self._pending.pop(item[0].file_id).set_result(None)
+                self._queue.task_done()
+
+    async def _download(self, limiter, info: MediaInfo, media) -> None:
+        self._tmp_dir.mkdir(exist_ok=True)
+        tmp = self._tmp_dir / f"{info.file_id}.part"
+        try:
+            with metrics.stage("media_download"):
+                path = await limiter.call(
+                    self.client.download_media, media, file=str(tmp)
+                )
+            if not path:
+                raise ValueError("nothing to download")
+            size = os.path.getsize(path)
+            sha256, stored = await asyncio.to_thread(self.store.put, Path(path))
+        finally:
+            tmp.unlink(missing_ok=True)
+        self.store.record(info, sha256, size)
+        self.downloaded += 1
+        self.bytes_downloaded += size
+        metrics.count("media_downloads_total", kind=info.kind)
+        metrics.count("media_download_bytes_total", size)
+        if stored:
+            metrics.count("bytes_written_total", size, kind="media")
+        else:
+            self.deduped += 1
+            metrics.count("media_dedup_total", by="content")
+
+    async def drain(self, group=None) -> None:
+        """
+        Wait until every file submitted for group so far is downloaded (or
+        failed).
+        """
+        ids = self._groups.pop(group, set())
+        waiting = [self._pending[i] for i in ids if i in self._pending]
+        if waiting:
+            await asyncio.gather(*waiting)
+
+    async def close(self) -> None:
+        await self._queue.join()
+        self._groups.clear()
+        for _ in self._workers:
+            self._queue.put_nowait(None)
+        await asyncio.gather(*self._workers)
+        try:
+            self._tmp_dir.rmdir()
+        except OSError:
+            pass
+
+    def cancel(self) -> None:
+        """
+        Stop the workers without waiting for the queue (failed runs).
+        """
+        for task in self._workers:
+            task.cancel()
+
+    def stats_line(self) -> str:
+        return (
+            f"media downloaded: {self.downloaded} "
+            f"({self.bytes_downloaded / 2**20:.1f} MiB) | deduped: {self.deduped} "
+            f"| skipped: {self.skipped} | failed: {self.failed}"
+        )
@@ -0,0 +1,195 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterator, Tuple
+
+# Prometheus metric name prefix
+PREFIX = "telegram_scraper"
+
+_Key = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+_lock = threading.Lock()
+_counters: Dict[_Key, float] = {}
+_gauges: Dict[_Key, float] = {}
+# (stage, labels) -> [seconds, entries]
+_stages: Dict[_Key, list] = {}
+_info: Dict[str, str] = {}
+_started = {"wall": time.time(), "perf": time.perf_counter()}
+
+
+def _key(name: str, labels: dict) -> _Key:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _render(key: _Key) -> str:
+    # name{label=value,...}, the key of a metric in the JSON summary
+    name, labels = key
+    if not labels:
+        return name
+    return name + "{" + ",".join(f"{k}={v}" for k, v in labels) + "}"
+
+
+def _round(value: float) -> float:
+    return round(value, 3) if isinstance(value, float) else value
+
+
+def reset() -> None:
+    """
+    Forget everything recorded so far (start of a run).
+    """
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _stages.clear()
+        _info.clear()
+        _started.update(wall=time.time(), perf=time.perf_counter())
+
+
+def count(name: str, value: float = 1, **labels) -> None:
+    """
+    Add value to a counter (e.g. RPCs, rows, bytes).
+    """
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def count_bytes(path: Path, kind: str) -> None:
+    """
+    Count the size of a file just written as bytes_written_total{kind}.
+    """
+    try:
+        count("bytes_written_total", os.path.getsize(path), kind=kind)
+    except OSError:
+        pass
+
+
+def set_gauge(name: str, value: float, **labels) -> None:
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+
+def set_info(**info) -> None:
+    """
+    Run attributes for the summary (mode, chat, ...).
+    """
+    with _lock:
+        _info.update({k: str(v) for k, v in info.items()})
+
+
+@contextmanager
+def stage(name: str, **labels) -> Iterator[None]:
+    """
+    Time a block (or, as a decorator, a sync function) as a stage.
+    Entries of the same stage add up, so stages run by concurrent tasks
+    can total more than the run's wall time.
+    """
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - t0
+        key = _key(name, labels)
+        with _lock:
+            entry = _stages.setdefault(key, [0.0, 0])
+            entry[0] += elapsed
+            entry[1] += 1
+
+
+def summary() -> dict:
+    """
+    Everything recorded since the last reset(), as a JSON-able dict.
+    """
+    with _lock:
+        return {
+            "started_at_utc": datetime.fromtimestamp(
+                _started["wall"], timezone.utc
+            ).isoformat(),
+            "wall_s": round(time.perf_counter() - _started["perf"], 3),
+            "info": dict(_info),
+            "stages": {
+                _render(k): {"seconds": round(s, 3), "count": n}
+                for k, (s, n) in sorted(_stages.items())
+            },
+            "counters": {_render(k): _round(v) for k, v in sorted(_counters.items())},
+            "gauges": {_render(k): _round(v) for k, v in sorted(_gauges.items())},
+        }
+
+
+def write_summary(path: Path) -> dict:
+    """
+    Append the run summary to a JSON lines file (one object per run).
+    Return: the summary
+    """
+    data = summary()
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(data, ensure_ascii=False) + "\n")
+    return data
+
+
+def _prom_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in labels
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def _prom_name(name: str) -> str:
+    return f"{PREFIX}_{name}"
+
+
+def write_prometheus(path: Path) -> None:
+    """
+    Write the current metrics in Prometheus text format (for the
+    node_exporter textfile collector). The file is replaced atomically.
+    """
+    with _lock:
+        stages = sorted(_stages.items())
+        counters = sorted(_counters.items())
+        gauges = sorted(_gauges.items())
+        info = dict(_info)
+        wall_s = time.perf_counter() - _started["perf"]
+
+    lines = []
+
+    def _family(name: str, kind: str, samples) -> None:
+        lines.append(f"# TYPE {_prom_name(name)} {kind}")
+        for labels, value in samples:
+            lines.append(f"{_prom_name(name)}{_prom_labels(labels)} {float(value)}")
+
+    _family("run_wall_seconds", "gauge", [((), wall_s)])
+    _family("run_finished_timestamp_seconds", "gauge", [((), time.time())])
+    if info:
+        _family("run_info", "gauge", [(tuple(sorted(info.items())), 1)])
+    _family(
+        "stage_seconds_total",
+        "counter",
+        [((("stage", name),) + labels, s) for (name, labels), (s, _) in stages],
+    )
+    _family(
+        "stage_entries_total",
+        "counter",
+        [((("stage", name),) + labels, n) for (name, labels), (_, n) in stages],
+    )
+    for kind, items in (("counter", counters), ("gauge", gauges)):
+        by_name: Dict[str, list] = {}
+        for (name, labels), value in items:
+            by_name.setdefault(name, []).append((labels, value))
+        for name, samples in by_name.items():
+            _family(name, kind, samples)
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp, path)
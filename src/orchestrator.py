@@ -0,0 +1,167 @@
+import asyncio
+import os
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import pyarrow.parquet as pq
+from dotenv import load_dotenv
+
+from db import ensure_tables_exist, get_conn
+
+# ====== CONFIG ======
+load_dotenv()
+# comma-separated chats to scrape and Telethon sessions (accounts) to use
+TARGET_CHATS = [
+    c.strip()
+    for c in os.getenv("TARGET_CHATS", os.getenv("TARGET_CHAT", "")).split(",")
+    if c.strip()
+]
+SESSIONS = [
+    s.strip()
+    for s in os.getenv("SESSIONS", os.getenv("SESSION", "william_user")).split(",")
+    if s.strip()
+]
+
+MYSQL_HOST = os.getenv("MYSQL_HOST", "test")
+MYSQL_USER = os.getenv("MYSQL_USER", "")
+MYSQL_PASSWORD = os.getenv("MYSQL_PASSWORD", "")
+MYSQL_DATABASE = os.getenv("MYSQL_DATABASE", "")
+MYSQL_PORT = int(os.getenv("MYSQL_PORT", "3306"))
+MYSQL_PARTITIONED = os.getenv("MYSQL_PARTITIONED", "0") == "1"
+MYSQL_FULLTEXT = os.getenv("MYSQL_FULLTEXT", "0") == "1"
+
+# every chat gets its own output directory under OUT_ROOT
+OUT_ROOT = Path(os.getenv("OUT_DIR", "telegram_dump"))
+
+# the single-chat job run once per chat, in its own process
+WORKER = Path(__file__).with_name("main.py")
+# ====================
+
+
+def chat_dir(chat: str) -> Path:
+    """
+    Output directory of one chat: OUT_ROOT/chat_<username or id>.
+    """
+    slug = re.sub(r"[^A-Za-z0-9_-]+", "_", chat.rsplit("/", 1)[-1]).strip("_")
+    return OUT_ROOT / f"chat_{slug or 'unknown'}"
+
+
+def chat_weight(chat: str) -> int:
+    """
+    Expected load of a chat: rows of its latest messages parquet (flat or
+    hive layout), 1 for chats never harvested.
+    """
+    out_dir = chat_dir(chat)
+    files = sorted(out_dir.glob("yesterday_all_topics_*.parquet"), key=lambda p: p.name)
+    files += sorted(out_dir.glob("all_topics/date=*/part-0.parquet"))
+    if not files:
+        return 1
+    return max(1, pq.read_metadata(files[-1]).num_rows)
+
+
+def assign_chats(
+    chats: List[str], sessions: List[str], weights: Dict[str, int]
+) -> Dict[str, List[str]]:
+    """
+    Balance chats over sessions: heaviest chat first, each to the session
+    with the least load so far (LPT scheduling).
+    """
+    if not sessions:
+        raise ValueError("No sessions configured (SESSIONS)")
+    load = {s: 0 for s in sessions}
+    plan: Dict[str, List[str]] = {s: [] for s in sessions}
+    for chat in sorted(chats, key=lambda c: -weights.get(c, 1)):
+        session = min(sessions, key=lambda s: (load[s], sessions.index(s)))
+        plan[session].append(chat)
+        load[session] += weights.get(chat, 1)
+    return plan
+
+
+async def _run_worker(chat: str, session: str) -> Tuple[int, float]:
+    """
+    Run main.py for one chat on one session; its output is prefixed with
+    the chat name. Return: (exit code, seconds)
+    """
+    out_dir = chat_dir(chat)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    env = dict(os.environ, TARGET_CHAT=chat, SESSION=session, OUT_DIR=str(out_dir))
+    t0 = time.perf_counter()
+    proc = await asyncio.create_subprocess_exec(
+        sys.executable,
+        "-u",
+        str(WORKER),
+        env=env,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT,
+    )
+    async for line in proc.stdout:
+        print(f"[{chat}] {line.decode(errors='replace').rstrip()}")
+    rc = await proc.wait()
+    return rc, time.perf_counter() - t0
+
+
+async def _run_session(session: str, chats: List[str]) -> List[Tuple[str, int, float]]:
+    # one Telethon session file can only be used by one process at a time
+    results = []
+    for chat in chats:
+        rc, elapsed = await _run_worker(chat, session)
+        results.append((chat, rc, elapsed))
+    return results
+
+
+def _prepare_mysql() -> None:
+    """
+    Create / migrate the tables once, before the workers load concurrently.
+    """
+    try:
+        conn = get_conn(
+            MYSQL_HOST, MYSQL_USER, MYSQL_PASSWORD, MYSQL_DATABASE, MYSQL_PORT
+        )
+    except Exception as e:
+        print(f"[!] MySQL not reachable ({e}), workers will prepare tables")
+        return
+    try:
+        ensure_tables_exist(
+            conn, partitioned=MYSQL_PARTITIONED, fulltext=MYSQL_FULLTEXT
+        )
+    finally:
+        conn.close()
+
+
+def main():
+    if not TARGET_CHATS:
+        raise SystemExit("[!] Set TARGET_CHATS (comma-separated)")
+    weights = {c: chat_weight(c) for c in TARGET_CHATS}
+    plan = assign_chats(TARGET_CHATS, SESSIONS, weights)
+    for session, chats in plan.items():
+        load = sum(weights[c] for c in chats)
+        print(f"[i] Session {session}: {chats or '-'} (load {load})")
+
+    _prepare_mysql()
+
+    async def _run():
+        # sessions (accounts) run in parallel, each with its own rate limit
+        per_session = await asyncio.gather(
+            *(_run_session(s, chats) for s, chats in plan.items() if chats)
+        )
+        return [r for results in per_session for r in results]
+
+    t0 = time.perf_counter()
+    results = asyncio.run(_run())
+    failed = [chat for chat, rc, _ in results if rc != 0]
+    for chat, rc, elapsed in results:
+        mark = "✓" if rc == 0 else "!"
+        print(f"[{mark}] {chat}: exit {rc} in {elapsed:.1f}s")
+    print(
+        f"[i] {len(results)} chat(s) on {len(SESSIONS)} session(s) "
+        f"in {time.perf_counter() - t0:.1f}s, {len(failed)} failed"
+    )
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,423 @@
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+import metrics
+
+# same columns/types as the DataFrame-built yesterday_all_topics_*.parquet,
+# plus chat_id (null when the writer is not given one) and the media columns
+# (null for messages without media, or when media capture is off)
+MESSAGE_SCHEMA = pa.schema(
+    [
+        ("topic_id", pa.int64()),
+        ("topic_title", pa.string()),
+        ("message_id", pa.int64()),
+        ("date_utc", pa.string()),
+        ("sender_id", pa.int64()),
+        ("sender_username", pa.string()),
+        ("text", pa.string()),
+        ("reply_to_msg_id", pa.float64()),
+        ("chat_id", pa.int64()),
+        ("media_type", pa.string()),
+        ("media_file_id", pa.int64()),
+        ("media_size", pa.int64()),
+        ("media_mime", pa.string()),
+        ("media_sha256", pa.string()),
+    ]
+)
+
+# opt-in compact variant of the same columns: a real UTC timestamp,
+# dictionary-encoded titles / usernames and integer reply ids
+COMPACT_MESSAGE_SCHEMA = pa.schema(
+    [
+        ("topic_id", pa.int64()),
+        ("topic_title", pa.dictionary(pa.int32(), pa.string())),
+        ("message_id", pa.int64()),
+        ("date_utc", pa.timestamp("us", tz="UTC")),
+        ("sender_id", pa.int64()),
+        ("sender_username", pa.dictionary(pa.int32(), pa.string())),
+        ("text", pa.string()),
+        ("reply_to_msg_id", pa.int64()),
+        ("chat_id", pa.int64()),
+        ("media_type", pa.dictionary(pa.int32(), pa.string())),
+        ("media_file_id", pa.int64()),
+        ("media_size", pa.int64()),
+        ("media_mime", pa.dictionary(pa.int32(), pa.string())),
+        ("media_sha256", pa.string()),
+    ]
+)
+
+# types_mapper of Arrow -> pandas conversions of message data: int64 columns
+# with nulls become nullable Int64, not float64, which is not exact for
+# 64-bit ids (media_file_id)
+INT64_NULLABLE = {pa.int64(): pd.Int64Dtype()}.get
+
+# zstd level of compact files (archive: written once, scanned many times)
+COMPACT_ZSTD_LEVEL = 6
+
+_APPEND_COLS = [
+    "topic_title",
+    "message_id",
+    "date_utc",
+    "sender_id",
+    "text",
+    "reply_to_msg_id",
+    "media",
+]
+
+
+def to_compact(table: pa.Table) -> pa.Table:
+    """
+    Cast the message columns present in table to COMPACT_MESSAGE_SCHEMA
+    types (ISO date strings are parsed, strings dictionary-encoded).
+    """
+    for i, name in enumerate(table.column_names):
+        if name not in COMPACT_MESSAGE_SCHEMA.names:
+            continue
+        target = COMPACT_MESSAGE_SCHEMA.field(name).type
+        col = table.column(i)
+        if col.type == target:
+            continue
+        if pa.types.is_dictionary(target) and not pa.types.is_dictionary(col.type):
+            col = pc.dictionary_encode(col.cast(target.value_type))
+        table = table.set_column(i, name, col.cast(target))
+    return table
+
+
+def compact_write_options(schema: pa.Schema) -> dict:
+    """
+    pq.ParquetWriter / pq.write_table options of compact files: zstd,
+    dictionary pages only for the repeated strings, min/max statistics
+    and the (topic_id, message_id) sort order recorded for pruning.
+    """
+    names = schema.names
+    return {
+        "compression": "zstd",
+        "compression_level": COMPACT_ZSTD_LEVEL,
+        "use_dictionary": [
+            c
+            for c in (
+                "topic_title",
+                "sender_username",
+                "chat_id",
+                "media_type",
+                "media_mime",
+            )
+            if c in names
+        ],
+        "write_statistics": True,
+        "sorting_columns": [
+            pq.SortingColumn(names.index(c))
+            for c in ("topic_id", "message_id")
+            if c in names
+        ],
+    }
+
+
+def write_messages_table(
+    table: pa.Table,
+    out_path: Path,
+    compact: bool = False,
+    row_group_size: int = 50_000,
+) -> None:
+    """
+    Write a messages table sorted by (topic_id, message_id), compact or in
+    the plain layout.
+    """
+    Path(out_path).parent.mkdir(parents=True, exist_ok=True)
+    if compact:
+        table = to_compact(table)
+        pq.write_table(
+            table,
+            out_path,
+            row_group_size=row_group_size,
+            **compact_write_options(table.schema),
+        )
+    else:
+        pq.write_table(table, out_path, row_group_size=row_group_size)
+    metrics.count_bytes(out_path, "messages")
+
+
+def _media_hashes(file_ids, media_hash_for) -> list:
+    if media_hash_for is None:
+        return [None] * len(file_ids)
+    return [media_hash_for(f) if f is not None else None for f in file_ids]
+
+
+def _fill_media_hashes(table: pa.Table, media_hash_for) -> pa.Table:
+    """
+    media_sha256 of table with its nulls filled from media_hash_for.
+    """
+    i = table.schema.get_field_index("media_sha256")
+    if i < 0 or table.column(i).null_count == table.column("media_file_id").null_count:
+        return table
+    hashes = _media_hashes(table.column("media_file_id").to_pylist(), media_hash_for)
+    filled = pc.coalesce(table.column(i), pa.array(hashes, pa.string()))
+    return table.set_column(i, "media_sha256", filled)
+
+
+def _dedup_key(topic_id: int, message_id: int) -> int:
+    # topic and message ids are 32-bit in Telegram: pack both in one int
+    return (topic_id << 32) | message_id
+
+
+class MessageParquetWriter:
+    """
+    Streaming, checkpointed writer for the messages parquet.
+    Rows are appended into typed per-topic column buffers and flushed as
+    small chunk files in a spill directory next to out_path, so memory stays
+    bounded by flush_rows per topic being harvested. (topic_id, message_id)
+    duplicates are dropped with a set of packed integers.
+    After every flush a manifest records the chunks and, per topic, the
+    oldest message_id flushed and whether the topic is done. A writer
+    opened on the same out_path after a crash picks the checkpoint up:
+    done topics can be skipped and the others resumed from resume_offset().
+    close() rewrites the chunks into out_path sorted by
+    (topic_id, message_id) in row groups of row_group_size; compact=True
+    writes it as COMPACT_MESSAGE_SCHEMA (spill chunks stay plain).
+    """
+
+    def __init__(
+        self,
+        out_path: Path,
+        row_group_size: int = 50_000,
+        chat_id: Optional[int] = None,
+        compact: bool = False,
+    ):
+        self.out_path = Path(out_path)
+        self.row_group_size = row_group_size
+        self.chat_id = chat_id
+        self.compact = compact
+        self.rows_written = 0
+        # "_" prefix: hidden from pyarrow dataset discovery (hive layout)
+        self._spill_dir = self.out_path.with_name(f"_{self.out_path.stem}.spill")
+        self._manifest_path = self._spill_dir / "manifest.json"
+        self._seen = set()
+        self._buffers: Dict[int, Dict[str, list]] = {}
+        # (topic_id, min message_id, chunk file) of every flushed chunk
+        self._groups: List[Tuple[int, int, str]] = []
+        # topic_id -> {"last_message_id": oldest flushed id, "done": bool}
+        self._topics: Dict[int, dict] = {}
+        self.resumed = self._load_checkpoint()
+
+    def _load_checkpoint(self) -> bool:
+        """
+        Reload a previous run's manifest (chunks not in it are dropped).
+        Return: True if a checkpoint was found
+        """
+        if not self._manifest_path.exists():
+            shutil.rmtree(self._spill_dir, ignore_errors=True)
+            return False
+        with open(self._manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        self._groups = [
+            (c["topic_id"], c["min_id"], c["file"]) for c in manifest["chunks"]
+        ]
+        self._topics = {int(k): v for k, v in manifest["topics"].items()}
+        listed = {name for _, _, name in self._groups} | {self._manifest_path.name}
+        for path in self._spill_dir.iterdir():
+            if path.name not in listed:
+                path.unlink()
+        for topic_id, _, name in self._groups:
+            ids = pq.ParquetFile(self._spill_dir / name).read(columns=["message_id"])
+            self._seen.update(
+                _dedup_key(topic_id, m) for m in ids["message_id"].to_pylist()
+            )
+            self.rows_written += ids.num_rows
+        return True
+
+    def _save_manifest(self) -> None:
+        manifest = {
+            "chunks": [
+                {"topic_id": t, "min_id": m, "file": name}
+                for t, m, name in self._groups
+            ],
+            "topics": {str(k): v for k, v in self._topics.items()},
+        }
+        tmp = self._manifest_path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp, self._manifest_path)
+
+    def is_done(self, topic_id: int) -> bool:
+        return self._topics.get(topic_id, {}).get("done", False)
+
+    def resume_offset(self, topic_id: int) -> int:
+        """
+        offset_id to continue a topic from (its oldest flushed message_id),
+        or 0 to start from the newest message.
+        """
+        return self._topics.get(topic_id, {}).get("last_message_id", 0)
+
+    def mark_done(self, topic_id: int) -> None:
+        """
+        Checkpoint a topic as fully harvested (call after its last flush).
+        """
+        self._topics.setdefault(topic_id, {"last_message_id": 0})["done"] = True
+        self._spill_dir.mkdir(parents=True, exist_ok=True)
+        self._save_manifest()
+
+    def append(
+        self,
+        topic_id: int,
+        topic_title: str,
+        message_id: int,
+        date_utc: str,
+        sender_id: Optional[int],
+        text: str,
+        reply_to_msg_id: Optional[int],
+        media: Optional[tuple] = None,
+    ) -> bool:
+        """
+        Buffer one message; media is its (type, file id, size, MIME type),
+        if any. Return False if it was already written.
+        """
+        key = _dedup_key(topic_id, message_id)
+        if key in self._seen:
+            return False
+        self._seen.add(key)
+        buf = self._buffers.get(topic_id)
+        if buf is None:
+            buf = self._buffers[topic_id] = {c: [] for c in _APPEND_COLS}
+        buf["topic_title"].append(topic_title)
+        buf["message_id"].append(message_id)
+        buf["date_utc"].append(date_utc)
+        buf["sender_id"].append(sender_id)
+        buf["text"].append(text)
+        buf["reply_to_msg_id"].append(reply_to_msg_id)
+        buf["media"].append(media)
+        return True
+
+    def pending(self, topic_id: int) -> int:
+        buf = self._buffers.get(topic_id)
+        return len(buf["message_id"]) if buf else 0
+
+    def flush_topic(
+        self,
+        topic_id: int,
+        username_for: Callable[[Optional[int]], Optional[str]],
+        media_hash_for: Optional[Callable[[int], Optional[str]]] = None,
+    ) -> Optional[pa.Table]:
+        """
+        Write the topic's buffered rows as one chunk file, filling
+        sender_username via username_for(sender_id) and, for media already
+        downloaded, media_sha256 via media_hash_for(file_id), and
+        checkpoint it.
+        Return: the rows written (sorted by message_id), or None
+        """
+        buf = self._buffers.pop(topic_id, None)
+        if not buf or not buf["message_id"]:
+            return None
+        n = len(buf["message_id"])
+        media = [m or (None, None, None, None) for m in buf["media"]]
+        media_type, file_id, size, mime = zip(*media)
+        batch = pa.RecordBatch.from_arrays(
+            [
+                pa.array([topic_id] * n, pa.int64()),
+                pa.array(buf["topic_title"], pa.string()),
+                pa.array(buf["message_id"], pa.int64()),
+                pa.array(buf["date_utc"], pa.string()),
+                pa.array(buf["sender_id"], pa.int64()),
+                pa.array([username_for(s) for s in buf["sender_id"]], pa.string()),
+                pa.array(buf["text"], pa.string()),
+                pa.array(buf["reply_to_msg_id"], pa.float64()),
+                pa.array([self.chat_id] * n, pa.int64()),
+                pa.array(media_type, pa.string()),
+                pa.array(file_id, pa.int64()),
+                pa.array(size, pa.int64()),
+                pa.array(mime, pa.string()),
+                pa.array(_media_hashes(file_id, media_hash_for), pa.string()),
+            ],
+            schema=MESSAGE_SCHEMA,
+        )
+        table = pa.Table.from_batches([batch])
+        table = table.take(pc.sort_indices(table, [("message_id", "ascending")]))
+        min_id = min(buf["message_id"])
+
+        self._spill_dir.mkdir(parents=True, exist_ok=True)
+        name = f"chunk_{len(self._groups):06d}.parquet"
+        tmp = self._spill_dir / (name + ".tmp")
+        with metrics.stage("parquet_write"):
+            pq.write_table(table, tmp)
+            os.replace(tmp, self._spill_dir / name)
+        self._groups.append((topic_id, min_id, name))
+        # messages come newest first: the oldest flushed id is where to resume
+        state = self._topics.setdefault(topic_id, {"last_message_id": 0})
+        last = state["last_message_id"]
+        state["last_message_id"] = min(last, min_id) if last else min_id
+        self._save_manifest()
+        self.rows_written += n
+        return table
+
+    @metrics.stage("parquet_write")
+    def close(
+        self, media_hash_for: Optional[Callable[[int], Optional[str]]] = None
+    ) -> int:
+        """
+        Assemble the sorted output file, filling the media_sha256 still
+        missing via media_hash_for(file_id) (media downloaded after its
+        rows were flushed). Return the number of rows written; no file is
+        created when nothing was written.
+        """
+        if not self._groups:
+            shutil.rmtree(self._spill_dir, ignore_errors=True)
+            return 0
+
+        # chunks never overlap within a topic: ordering them by
+        # (topic_id, min message_id) gives a fully sorted file
+        self.out_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.out_path.with_name(f"_{self.out_path.stem}.tmp.parquet")
+        schema, options = MESSAGE_SCHEMA, {}
+        if self.compact:
+            schema = COMPACT_MESSAGE_SCHEMA
+            options = compact_write_options(schema)
+        pending, pending_rows = [], 0
+
+        def _write(writer) -> None:
+            table = pa.concat_tables(pending)
+            if media_hash_for is not None:
+                table = _fill_media_hashes(table, media_hash_for)
+            if self.compact:
+                table = to_compact(table)
+            writer.write_table(table, row_group_size=self.row_group_size)
+
+        with pq.ParquetWriter(str(tmp_path), schema, **options) as writer:
+            for _, _, name in sorted(self._groups):
+                pending.append(pq.ParquetFile(self._spill_dir / name).read())
+                pending_rows += pending[-1].num_rows
+                if pending_rows >= self.row_group_size:
+                    _write(writer)
+                    pending, pending_rows = [], 0
+            if pending:
+                _write(writer)
+        os.replace(tmp_path, self.out_path)
+        shutil.rmtree(self._spill_dir)
+        metrics.count_bytes(self.out_path, "messages")
+        return self.rows_written
+
+
+def sweep_spill_dirs(out_dir: Path, max_age_s: float) -> List[Path]:
+    """
+    Remove the spill directories in out_dir (next to the output files)
+    that no writer touched for max_age_s: a crashed run of a day that is
+    never run again leaves its checkpoint behind, while a live writer
+    updates its manifest on every flush.
+    Return: the directories removed
+    """
+    cutoff = time.time() - max_age_s
+    stale = [
+        d
+        for d in Path(out_dir).glob("_*.spill")
+        if d.is_dir() and d.stat().st_mtime < cutoff
+    ]
+    for d in stale:
+        shutil.rmtree(d, ignore_errors=True)
+    return stale
@@ -0,0 +1,101 @@
+import asyncio
+import time
+from typing import Optional
+
+import pyarrow as pa
+
+import metrics
+from db import commit_batch, insert_frame, prepare_frame
+from parquet_sink import INT64_NULLABLE
+
+
+class MySQLStreamLoader:
+    """
+    Loads message batches into MySQL while the harvest is still running.
+    The harvest puts each flushed Arrow table on a bounded asyncio queue;
+    `streams` loader tasks, each on its own pooled connection, insert and
+    commit them in a worker thread. When the queue is full, put() waits,
+    so memory stays bounded if MySQL is slower than Telegram.
+    """
+
+    def __init__(
+        self,
+        pool,
+        table_name: str,
+        date_label: str,
+        streams: int = 2,
+        max_pending: int = 8,
+        method: str = "executemany",
+        batch_size: int = 1000,
+    ):
+        self.pool = pool
+        self.table_name = table_name
+        self.date_label = date_label
+        self.method = method
+        self.batch_size = batch_size
+        self.rows_loaded = 0
+        self.error: Optional[BaseException] = None
+        self._queue: "asyncio.Queue[Optional[pa.Table]]" = asyncio.Queue(
+            maxsize=max_pending
+        )
+        self._tasks = [asyncio.create_task(self._consume()) for _ in range(streams)]
+
+    def _load(self, conn, table: pa.Table) -> int:
+        t0 = time.perf_counter()
+        df = prepare_frame(
+            table.to_pandas(types_mapper=INT64_NULLABLE),
+            self.table_name,
+            self.date_label,
+        )
+        n = commit_batch(
+            conn,
+            lambda: insert_frame(
+                conn, df, self.table_name, self.batch_size, self.method
+            ),
+        )
+        metrics.count("mysql_rows_total", n, table=self.table_name)
+        metrics.count(
+            "mysql_load_seconds_total", time.perf_counter() - t0, table=self.table_name
+        )
+        return n
+
+    async def _consume(self) -> None:
+        conn = None
+        try:
+            conn = await asyncio.to_thread(self.pool.get_connection)
+        except Exception as e:
+            # no connection: still drain, so the harvest never blocks
+            self.error = e
+            print(f"[!] Streaming load into {self.table_name} failed: {e}")
+        try:
+            while True:
+                table = await self._queue.get()
+                if table is None:
+                    return
+                if self.error is not None:
+                    continue  # keep draining so the harvest never blocks
+                try:
+                    n = await asyncio.to_thread(self._load, conn, table)
+                    self.rows_loaded += n
+                except Exception as e:
+                    self.error = e
+                    print(f"[!] Streaming load into {self.table_name} failed: {e}")
+        finally:
+            if conn is not None:
+                await asyncio.to_thread(conn.close)
+
+    async def put(self, table: Optional[pa.Table]) -> None:
+        if table is not None and table.num_rows:
+            await self._queue.put(table)
+
+    async def close(self) -> Optional[int]:
+        """
+        Wait for every queued batch. Return: rows loaded, or None if the
+        streaming load failed (the caller should load from parquet instead)
+        """
+        for _ in self._tasks:
+            await self._queue.put(None)
+        for result in await asyncio.gather(*self._tasks, return_exceptions=True):
+            if isinstance(result, Exception) and self.error is None:
+                self.error = result
+        return None if self.error is not None else self.rows_loaded
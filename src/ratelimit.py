@@ -0,0 +1,131 @@
+import asyncio
+import weakref
+from typing import Awaitable, Callable, TypeVar
+
+from telethon.errors.rpcerrorlist import FloodWaitError
+
+import metrics
+
+T = TypeVar("T")
+
+# defaults of the per-client limiter (requests per second)
+DEFAULT_RATE = 5.0
+DEFAULT_BURST = 5
+DEFAULT_MIN_RATE = 0.2
+DEFAULT_MAX_RATE = 30.0
+
+_limiters: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+class RateLimiter:
+    """
+    Adaptive token bucket shared by every RPC made over one client.
+    Calls are spaced at `rate` per second with bursts of up to `burst`
+    (GCRA scheduling: no lock, no background task). The rate creeps up
+    after each successful call and is halved on FloodWait, so it settles
+    just under the server's real limit (AIMD). A FloodWait also pauses every
+    caller until its deadline, then the same call is retried.
+    """
+
+    def __init__(
+        self,
+        rate: float = DEFAULT_RATE,
+        burst: int = DEFAULT_BURST,
+        min_rate: float = DEFAULT_MIN_RATE,
+        max_rate: float = DEFAULT_MAX_RATE,
+    ):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        # theoretical arrival time of the next call, and FloodWait deadline
+        self._tat = 0.0
+        self._until = 0.0
+        self.calls = 0
+        self.flood_waits = 0
+        # caller-seconds spent waiting in acquire()
+        self.throttled_s = 0.0
+
+    async def acquire(self) -> None:
+        """
+        Wait for this caller's slot (and any FloodWait deadline).
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            now = loop.time()
+            interval = 1.0 / self.rate
+            tat = max(self._tat, now)
+            start = max(now, tat - (self.burst - 1) * interval, self._until)
+            # reserve the slot before sleeping: no await in between
+            self._tat = max(tat, start) + interval
+            delay = start - now
+            if delay <= 0:
+                return
+            self.throttled_s += delay
+            metrics.count("throttled_seconds_total", delay)
+            await asyncio.sleep(delay)
+            if loop.time() >= self._until:
+                return
+            # a FloodWait arrived while sleeping: queue again behind it
+
+    def on_success(self) -> None:
+        # additive increase: about +1 req/s for every `rate` calls
+        self.rate = min(self.max_rate, self.rate + 1.0 / self.rate)
+
+    def on_flood(self, seconds: float) -> None:
+        # multiplicative decrease, and everyone waits out the deadline
+        loop = asyncio.get_running_loop()
+        self.flood_waits += 1
+        self.rate = max(self.min_rate, self.rate / 2)
+        self._until = max(self._until, loop.time() + seconds)
+        self._tat = self._until
+
+    async def call(self, fn: Callable[..., Awaitable[T]], *args, **kwargs) -> T:
+        """
+        Await fn(*args, **kwargs) under the limiter, retrying the same call
+        after every FloodWait.
+        """
+        method = _rpc_name(fn, args)
+        while True:
+            await self.acquire()
+            self.calls += 1
+            metrics.count("telegram_rpc_total", method=method)
+            try:
+                with metrics.stage("rpc", method=method):
+                    result = await fn(*args, **kwargs)
+            except FloodWaitError as e:
+                wait_s = e.seconds + 1
+                print(f"[!] FloodWait {wait_s}s, pausing all requests (retrying)")
+                metrics.count("flood_waits_total", method=method)
+                metrics.count("flood_wait_seconds_total", wait_s)
+                self.on_flood(wait_s)
+                continue
+            self.on_success()
+            return result
+
+    def stats_line(self) -> str:
+        return (
+            f"rate limiter calls: {self.calls} | flood waits: {self.flood_waits} "
+            f"| throttled: {self.throttled_s:.1f}s | rate: {self.rate:.1f}/s"
+        )
+
+
+def _rpc_name(fn, args) -> str:
+    # client(request) calls are named after the request type
+    if not hasattr(fn, "__name__") and args:
+        return type(args[0]).__name__
+    return getattr(fn, "__name__", type(fn).__name__)
+
+
+def get_limiter(client, **kwargs) -> RateLimiter:
+    """
+    The RateLimiter of a client, created with kwargs on first use.
+    Telethon's own silent FloodWait sleeps are turned off so that every
+    FloodWait reaches the limiter and tunes the rate.
+    """
+    limiter = _limiters.get(client)
+    if limiter is None:
+        limiter = _limiters[client] = RateLimiter(**kwargs)
+        if hasattr(client, "flood_sleep_threshold"):
+            client.flood_sleep_threshold = 0
+    return limiter
@@ -1,7 +1,20 @@
 from __future__ import annotations
 from pathlib import Path
 from datetime import datetime, timedelta, timezone
+from typing import Tuple
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import metrics
+from threads import (
+    THREAD_INPUT_COLS,
+    THREAD_METRICS,
+    build_thread_graph,
+    thread_stats,
+    thread_table,
+)
 
 JKT_OFFSET = timedelta(hours=7)
 
@@ -14,135 +27,320 @@ def _yday_label_iso(now_utc: datetime) -> str:
     return (now_utc + JKT_OFFSET - timedelta(days=1)).date().isoformat()
 
 
+REPORT_SCHEMA = pa.schema(
+    [
+        ("date_label_jkt", pa.string()),
+        ("metric", pa.string()),
+        ("topic_id", pa.int64()),
+        ("topic_title", pa.string()),
+        ("message_count", pa.int64()),
+        ("sender_id", pa.int64()),
+        ("sender_username", pa.string()),
+        ("rank_by_messages", pa.int64()),
+        ("value", pa.int64()),
+        ("chat_id", pa.int64()),
+    ]
+)
+
+
+# compact per-day partial aggregate: messages per (topic, sender) pair.
+# Summing message_count over days merges any number of days exactly
+# (per-topic / per-sender totals, distinct senders, rankings).
+REPORT_STATE_SCHEMA = pa.schema(
+    [
+        ("date_label_jkt", pa.string()),
+        ("topic_id", pa.int64()),
+        ("topic_title", pa.string()),
+        ("sender_id", pa.int64()),
+        ("sender_username", pa.string()),
+        ("message_count", pa.int64()),
+    ]
+)
+
+
+def _factorize_sorted(values: pd.Series) -> Tuple[np.ndarray, pd.Index]:
+    """
+    pd.factorize(sort=True, NaN last), but hashing unsorted and only
+    sorting the (few) uniques, then remapping the codes. Categorical input
+    (e.g. dictionary-encoded parquet columns) reuses its codes, no hashing.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes = values.cat.codes.to_numpy().astype(np.int64)
+        uniques = pd.Index(values.cat.categories, dtype=object)
+        if (codes < 0).any():
+            codes[codes < 0] = len(uniques)
+            uniques = uniques.append(pd.Index([None], dtype=object))
+    else:
+        codes, uniques = pd.factorize(values, use_na_sentinel=False)
+        uniques = pd.Index(uniques)
+    sorted_uniques, order = uniques.sort_values(na_position="last", return_indexer=True)
+    remap = np.empty(len(order), dtype=np.int64)
+    remap[order] = np.arange(len(order))
+    return remap[codes], sorted_uniques
+
+
+def _group_codes(
+    key1: pd.Series, key2: pd.Series
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, pd.Index, pd.Index]:
+    """
+    Group rows by (key1, key2): factorize both keys (sorted, NaN last, like
+    groupby(dropna=False)) and combine them into one integer code.
+    Return: (group code per row, key1 codes, key2 codes, key1 uniques,
+    key2 uniques), groups ordered by (key1, key2)
+    """
+    c1, u1 = _factorize_sorted(key1)
+    c2, u2 = _factorize_sorted(key2)
+    width = max(len(u2), 1)
+    row_codes, groups = pd.factorize(c1.astype(np.int64) * width + c2, sort=True)
+    groups = np.asarray(groups, dtype=np.int64)
+    return row_codes, groups // width, groups % width, u1, u2
+
+
+def _group_count(
+    key1: pd.Series, key2: pd.Series, weights: np.ndarray | None = None
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, pd.Index, pd.Index]:
+    """
+    Count rows (or sum weights) per (key1, key2) with one bincount.
+    Return: (counts, key1 codes, key2 codes, key1 uniques, key2 uniques)
+    """
+    row_codes, c1, c2, u1, u2 = _group_codes(key1, key2)
+    counts = np.bincount(row_codes, weights=weights, minlength=len(c1))
+    return counts.astype(np.int64), c1, c2, u1, u2
+
+
+def _rank_contributors(
+    counts: np.ndarray, username_codes: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Contributor order: count desc, username asc (NaN last), ties keep
+    (sender_id, sender_username) order.
+    Return: (order, dense rank of each ordered group)
+    """
+    order = np.lexsort((username_codes, -counts))
+    ranks = np.unique(-counts[order], return_inverse=True)[1] + 1
+    return order, ranks.astype(np.int64)
+
+
+def contributors_table(
+    sender_id: pd.Series, sender_username: pd.Series, weights: np.ndarray | None = None
+) -> pa.Table:
+    """
+    Top contributors as in the daily report, from messages (weights=None)
+    or from merged report states (weights=message_count).
+    Return: table of sender_id, sender_username, message_count,
+    rank_by_messages
+    """
+    if not len(sender_id):
+        return pa.table(
+            {
+                "sender_id": pa.array([], pa.int64()),
+                "sender_username": pa.array([], pa.string()),
+                "message_count": pa.array([], pa.int64()),
+                "rank_by_messages": pa.array([], pa.int64()),
+            }
+        )
+    counts, c1, c2, u1, u2 = _group_count(sender_id, sender_username, weights)
+    order, ranks = _rank_contributors(counts, c2)
+    return pa.table(
+        {
+            "sender_id": _take(u1, c1[order], pa.int64()),
+            "sender_username": _take(u2, c2[order], pa.string()),
+            "message_count": pa.array(counts[order], pa.int64()),
+            "rank_by_messages": pa.array(ranks, pa.int64()),
+        }
+    )
+
+
+def _take(uniques: pd.Index, codes: np.ndarray, type_: pa.DataType) -> pa.Array:
+    values = pd.Series(uniques.take(codes))
+    return pa.array(values, type=type_, from_pandas=True)
+
+
+def _write_report_state(
+    state_path: Path,
+    date_label_jkt_iso: str,
+    pair_codes: np.ndarray,
+    n_sender_groups: int,
+    topic_groups: tuple,
+    sender_groups: tuple,
+) -> None:
+    """
+    Write messages per (topic group, sender group) pair; pair_codes is
+    topic group * n_sender_groups + sender group for every message.
+    """
+    pair_rows, pairs = pd.factorize(pair_codes, sort=True)
+    counts = np.bincount(pair_rows, minlength=len(pairs))
+    pairs = np.asarray(pairs, dtype=np.int64)
+    t_idx, s_idx = pairs // n_sender_groups, pairs % n_sender_groups
+    t_u1, t_c1, t_u2, t_c2 = topic_groups
+    s_u1, s_c1, s_u2, s_c2 = sender_groups
+    table = pa.Table.from_arrays(
+        [
+            pa.array([date_label_jkt_iso] * len(pairs), pa.string()),
+            _take(t_u1, t_c1[t_idx], pa.int64()),
+            _take(t_u2, t_c2[t_idx], pa.string()),
+            _take(s_u1, s_c1[s_idx], pa.int64()),
+            _take(s_u2, s_c2[s_idx], pa.string()),
+            pa.array(counts, pa.int64()),
+        ],
+        schema=REPORT_STATE_SCHEMA,
+    )
+    Path(state_path).parent.mkdir(parents=True, exist_ok=True)
+    pq.write_table(table, state_path)
+    metrics.count_bytes(state_path, "report_state")
+
+
+@metrics.stage("build_report")
 def build_yesterday_report_parquet(
     df_messages: pd.DataFrame,
     out_dir: Path,
     now_utc: datetime,
     all_topics: list | None = None,
+    out_path: Path | None = None,
+    state_path: Path | None = None,
+    chat_id: int | None = None,
+    threads_path: Path | None = None,
 ) -> Path:
     """
     Generate a daily report parquet file containing:
     1) Messages per topic
     2) Top contributors
-    3) Summary counts (topics_count, messages_total)
+    3) Reply-thread metrics per topic (THREAD_METRICS, in value), when
+       df_messages has the THREAD_INPUT_COLS
+    4) Summary counts (topics_count, messages_total)
+    Written to out_path if given, else out_dir/yesterday_report_YYYYMMDD.parquet.
+    All metrics come from one factorize + bincount pass per key pair, and the
+    superset schema is built directly as Arrow columns.
+    If state_path is given, the day's partial aggregate (REPORT_STATE_SCHEMA)
+    is written there too; the rolling report merges those over its window.
+    chat_id (the MySQL key of multi-chat runs) is repeated on every row.
+    If threads_path is given, the day's thread graph (THREAD_SCHEMA) is
+    written there too.
     """
     date_label_jkt_iso = _yday_label_iso(now_utc)
     yday_str = _yday_label_str(now_utc)
+    n_messages = int(len(df_messages))
 
-    # --- 1) Messages per topic
-    if not df_messages.empty:
-        g_topic = (
-            df_messages.groupby(["topic_id", "topic_title"], dropna=False)
-            .size()
-            .reset_index(name="message_count")
-        )
-        df_topic = g_topic.assign(
-            date_label_jkt=date_label_jkt_iso,
-            metric="messages_per_topic",
-        )[["date_label_jkt", "metric", "topic_id", "topic_title", "message_count"]]
-    else:
-        df_topic = pd.DataFrame(
-            columns=[
-                "date_label_jkt",
-                "metric",
-                "topic_id",
-                "topic_title",
-                "message_count",
-            ]
+    if n_messages:
+        # --- 1) Messages per topic
+        t_rows, t_c1, t_c2, t_u1, t_u2 = _group_codes(
+            df_messages["topic_id"], df_messages["topic_title"]
         )
+        t_counts = np.bincount(t_rows, minlength=len(t_c1))
 
-    # --- 2) Top contributors
-    if not df_messages.empty:
-        g_sender = (
-            df_messages.groupby(["sender_id", "sender_username"], dropna=False)
-            .size()
-            .reset_index(name="message_count")
-            .sort_values(["message_count", "sender_username"], ascending=[False, True])
-        )
-        g_sender["rank_by_messages"] = (
-            g_sender["message_count"].rank(method="dense", ascending=False).astype(int)
+        # --- 2) Top contributors
+        s_rows, s_c1, s_c2, s_u1, s_u2 = _group_codes(
+            df_messages["sender_id"], df_messages["sender_username"]
         )
+        s_counts = np.bincount(s_rows, minlength=len(s_c1))
 
-        df_contrib = g_sender.assign(
-            date_label_jkt=date_label_jkt_iso,
-            metric="contributors",
-        )[
-            [
-                "date_label_jkt",
-                "metric",
-                "sender_id",
-                "sender_username",
-                "message_count",
-                "rank_by_messages",
-            ]
-        ]
+        if state_path is not None:
+            _write_report_state(
+                state_path,
+                date_label_jkt_iso,
+                t_rows * len(s_c1) + s_rows,
+                len(s_c1),
+                (t_u1, t_c1, t_u2, t_c2),
+                (s_u1, s_c1, s_u2, s_c2),
+            )
+
+        order, ranks = _rank_contributors(s_counts, s_c2)
+        s_counts, s_c1, s_c2 = s_counts[order], s_c1[order], s_c2[order]
+        n_distinct_topics = int(t_u1.notna().sum())
     else:
-        df_contrib = pd.DataFrame(
-            columns=[
-                "date_label_jkt",
-                "metric",
-                "sender_id",
-                "sender_username",
-                "message_count",
-                "rank_by_messages",
-            ]
+        t_counts = s_counts = ranks = np.array([], dtype=np.int64)
+        t_c1 = t_c2 = s_c1 = s_c2 = t_counts
+        t_u1 = t_u2 = s_u1 = s_u2 = pd.Index([])
+        n_distinct_topics = 0
+
+    # --- 3) Reply threads
+    threads = None
+    if n_messages and set(THREAD_INPUT_COLS) <= set(df_messages.columns):
+        graph = build_thread_graph(
+            df_messages["topic_id"],
+            df_messages["message_id"],
+            df_messages["reply_to_msg_id"],
+        )
+        threads = thread_stats(graph, df_messages["date_utc"])
+        if threads_path is not None:
+            Path(threads_path).parent.mkdir(parents=True, exist_ok=True)
+            pq.write_table(thread_table(graph, date_label_jkt_iso), threads_path)
+            metrics.count_bytes(threads_path, "threads")
+        # metric by metric, topics in topic_id order; titles as in 1)
+        thread_topics = pa.array(
+            np.tile(threads["topic_id"].to_numpy(), len(THREAD_METRICS)), pa.int64()
+        )
+        title_of = dict(zip(t_u1.take(t_c1), t_u2.take(t_c2)))
+        thread_titles = pa.array(
+            [title_of.get(t) for t in thread_topics.to_pylist()], pa.string()
+        )
+        thread_values = pa.concat_arrays(
+            [pa.array(threads[m], pa.int64(), from_pandas=True) for m in THREAD_METRICS]
         )
 
-    # --- 3) Summary counts
-    topics_count = (
-        int(df_messages["topic_id"].nunique()) if not df_messages.empty else 0
-    )
-    messages_total = int(len(df_messages)) if not df_messages.empty else 0
+    # --- 4) Summary counts
+    topics_count = len(all_topics) if all_topics is not None else n_distinct_topics
 
-    topics_count = None
-    if all_topics is not None:
-        topics_count = len(all_topics)
-    else:
-        topics_count = (
-            int(df_messages["topic_id"].nunique()) if not df_messages.empty else 0
-        )
+    n_topic, n_sender = len(t_counts), len(s_counts)
+    n_thread = len(threads) * len(THREAD_METRICS) if threads is not None else 0
+    n_total = n_topic + n_sender + n_thread + 2
 
-    messages_total = int(len(df_messages)) if not df_messages.empty else 0
+    def _col(topic_part, sender_part, summary_part, type_, thread_part=None):
+        return pa.concat_arrays(
+            [
+                topic_part if topic_part is not None else pa.nulls(n_topic, type_),
+                sender_part if sender_part is not None else pa.nulls(n_sender, type_),
+                thread_part if thread_part is not None else pa.nulls(n_thread, type_),
+                summary_part if summary_part is not None else pa.nulls(2, type_),
+            ]
+        )
 
-    df_summary = pd.DataFrame(
+    metric = ["messages_per_topic"] * n_topic + ["contributors"] * n_sender
+    if threads is not None:
+        metric += [m for m in THREAD_METRICS for _ in range(len(threads))]
+    metric += ["topics_count", "messages_total"]
+    table = pa.Table.from_arrays(
         [
-            {
-                "date_label_jkt": date_label_jkt_iso,
-                "metric": "topics_count",
-                "value": topics_count,
-            },
-            {
-                "date_label_jkt": date_label_jkt_iso,
-                "metric": "messages_total",
-                "value": messages_total,
-            },
-        ]
-    )[["date_label_jkt", "metric", "value"]]
-
-    superset_cols = [
-        "date_label_jkt",
-        "metric",
-        "topic_id",
-        "topic_title",
-        "message_count",
-        "sender_id",
-        "sender_username",
-        "rank_by_messages",
-        "value",
-    ]
-    for df_ in (df_topic, df_contrib, df_summary):
-        for col in superset_cols:
-            if col not in df_.columns:
-                df_[col] = pd.NA
-        df_.reset_index(drop=True, inplace=True)
-        df_ = df_[superset_cols]
-
-    df_all = pd.concat(
-        [df_topic[superset_cols], df_contrib[superset_cols], df_summary[superset_cols]],
-        ignore_index=True,
+            pa.array([date_label_jkt_iso] * n_total, pa.string()),
+            pa.array(metric, pa.string()),
+            _col(
+                _take(t_u1, t_c1, pa.int64()),
+                None,
+                None,
+                pa.int64(),
+                thread_topics if threads is not None else None,
+            ),
+            _col(
+                _take(t_u2, t_c2, pa.string()),
+                None,
+                None,
+                pa.string(),
+                thread_titles if threads is not None else None,
+            ),
+            _col(
+                pa.array(t_counts, pa.int64()),
+                pa.array(s_counts, pa.int64()),
+                None,
+                pa.int64(),
+            ),
+            _col(None, _take(s_u1, s_c1, pa.int64()), None, pa.int64()),
+            _col(None, _take(s_u2, s_c2, pa.string()), None, pa.string()),
+            _col(None, pa.array(ranks, pa.int64()), None, pa.int64()),
+            _col(
+                None,
+                None,
+                pa.array([topics_count, n_messages], pa.int64()),
+                pa.int64(),
+                thread_values if threads is not None else None,
+            ),
+            pa.array([chat_id] * n_total, pa.int64()),
+        ],
+        schema=REPORT_SCHEMA,
     )
 
-    out_dir.mkdir(parents=True, exist_ok=True)
-    out_path = out_dir / f"yesterday_report_{yday_str}.parquet"
-    df_all.to_parquet(out_path, index=False)
+    if out_path is None:
+        out_path = out_dir / f"yesterday_report_{yday_str}.parquet"
+    Path(out_path).parent.mkdir(parents=True, exist_ok=True)
+    pq.write_table(table, out_path)
+    metrics.count_bytes(out_path, "report")
     return out_path
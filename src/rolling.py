@@ -0,0 +1,302 @@
+from __future__ import annotations
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Iterable, List, Sequence
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+import metrics
+from parquet_sink import INT64_NULLABLE
+from reports import contributors_table
+from storage import dataset_path
+
+# windows (in Jakarta days, ending at the report day) of the rolling report
+ROLLING_WINDOWS = (7, 30)
+
+# only what the rolling metrics need: never the message text
+SCAN_COLUMNS = ["topic_id", "topic_title", "sender_id", "sender_username"]
+
+ROLLING_SCHEMA = pa.schema(
+    [
+        ("date_label_jkt", pa.string()),
+        ("window_days", pa.int64()),
+        ("metric", pa.string()),
+        ("topic_id", pa.int64()),
+        ("topic_title", pa.string()),
+        ("message_count", pa.int64()),
+        ("prev_message_count", pa.int64()),
+        ("active_senders", pa.int64()),
+        ("sender_id", pa.int64()),
+        ("sender_username", pa.string()),
+        ("rank_by_messages", pa.int64()),
+    ]
+)
+
+
+def _flat_day(path: Path) -> date | None:
+    # yesterday_<kind>_YYYYMMDD.parquet
+    stem = path.stem.rsplit("_", 1)[-1]
+    try:
+        return date(int(stem[:4]), int(stem[4:6]), int(stem[6:8]))
+    except ValueError:
+        return None
+
+
+def _decode_dictionaries(schema: pa.Schema) -> pa.Schema:
+    # compact files hold titles / usernames dictionary-encoded: scan them as
+    # plain strings so days written either way concatenate
+    return pa.schema(
+        [
+            f.with_type(f.type.value_type) if pa.types.is_dictionary(f.type) else f
+            for f in schema
+        ]
+    )
+
+
+def scan_archive(
+    out_dir: Path,
+    first: date,
+    last: date,
+    layout: str = "flat",
+    columns: Sequence[str] = SCAN_COLUMNS,
+    kind: str = "all_topics",
+    exclude_days: Iterable[date] = (),
+) -> pa.Table | None:
+    """
+    Read the given columns of every archived file of a kind between first
+    and last (Jakarta days, both included, minus exclude_days), plus a
+    "date" column (YYYY-MM-DD).
+    Files outside the range are never opened: flat files are picked by the
+    date in their name, hive partitions by a filter on the date= key.
+    Return: the table, or None when no file matches
+    """
+    columns = list(columns)
+    excluded = sorted(d.isoformat() for d in exclude_days)
+    if layout == "hive":
+        root = Path(out_dir) / kind
+        if not root.exists():
+            return None
+        partitioning = ds.partitioning(
+            pa.schema([("date", pa.string())]), flavor="hive"
+        )
+        dataset = ds.dataset(str(root), format="parquet", partitioning=partitioning)
+        dataset = ds.dataset(
+            str(root),
+            format="parquet",
+            partitioning=partitioning,
+            schema=_decode_dictionaries(dataset.schema),
+        )
+        date_filter = (ds.field("date") >= first.isoformat()) & (
+            ds.field("date") <= last.isoformat()
+        )
+        if excluded:
+            date_filter &= ~ds.field("date").isin(excluded)
+        table = dataset.to_table(columns=columns + ["date"], filter=date_filter)
+        return table if table.num_rows else None
+
+    parts = []
+    for path in sorted(Path(out_dir).glob(f"yesterday_{kind}_*.parquet")):
+        day = _flat_day(path)
+        if day is None or not first <= day <= last or day.isoformat() in excluded:
+            continue
+        part = pq.read_table(path, columns=columns)
+        part = part.cast(_decode_dictionaries(part.schema))
+        parts.append(
+            part.append_column(
+                "date", pa.array([day.isoformat()] * part.num_rows, pa.string())
+            )
+        )
+    if not parts:
+        return None
+    return pa.concat_tables(parts, promote_options="permissive")
+
+
+def scan_message_counts(
+    out_dir: Path, first: date, last: date, layout: str = "flat"
+) -> pa.Table | None:
+    """
+    Messages per (day, topic, sender) between first and last. Days with a
+    report_state file read that small partial aggregate; older days without
+    one fall back to the raw messages (message_count=1 per row).
+    """
+    states = scan_archive(
+        out_dir,
+        first,
+        last,
+        layout,
+        columns=SCAN_COLUMNS + ["message_count"],
+        kind="report_state",
+    )
+    state_days = (
+        {date.fromisoformat(d) for d in pc.unique(states["date"]).to_pylist()}
+        if states is not None
+        else set()
+    )
+    raw = scan_archive(out_dir, first, last, layout, exclude_days=state_days)
+    if raw is not None:
+        raw = raw.append_column(
+            "message_count", pa.array(np.ones(raw.num_rows, dtype=np.int64))
+        ).select(SCAN_COLUMNS + ["message_count", "date"])
+    parts = [
+        t.select(SCAN_COLUMNS + ["message_count", "date"])
+        for t in (states, raw)
+        if t is not None
+    ]
+    if not parts:
+        return None
+    return pa.concat_tables(parts, promote_options="permissive")
+
+
+def _distinct_pairs(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Unique (a, b) rows; return their a values (one per distinct pair).
+    """
+    if not len(a):
+        return a
+    pairs = np.unique(np.stack([a, b], axis=1), axis=0)
+    return pairs[:, 0]
+
+
+def _with_schema(columns: dict, n: int) -> pa.Table:
+    """
+    n rolling report rows from the given columns, the others null.
+    """
+    return pa.Table.from_arrays(
+        [columns.get(f.name, pa.nulls(n, f.type)) for f in ROLLING_SCHEMA],
+        schema=ROLLING_SCHEMA,
+    )
+
+
+@metrics.stage("build_rolling_report")
+def build_rolling_report_parquet(
+    out_dir: Path,
+    end_day: date,
+    layout: str = "flat",
+    windows: Iterable[int] = ROLLING_WINDOWS,
+    out_path: Path | None = None,
+) -> Path | None:
+    """
+    Generate a rolling report parquet for the windows ending at end_day:
+    1) active_senders / messages_total per window (chat level)
+    2) topic_trend per window: messages in the window vs the window before,
+       and active senders per topic
+    3) contributors per window, ranked like the daily report
+    Built from the per-day report states (raw messages for days without
+    one), so the cost follows the number of days, not of messages.
+    Return: path written, or None when the archive has no data in range
+    """
+    windows = sorted(set(int(w) for w in windows))
+    if not windows:
+        return None
+    # two windows back for the "previous window" of the longest one
+    first = end_day - timedelta(days=2 * windows[-1] - 1)
+    table = scan_message_counts(out_dir, first, end_day, layout)
+    if table is None or table.num_rows == 0:
+        return None
+    weights = table["message_count"].to_numpy(zero_copy_only=False)
+
+    # days before end_day (0 = end_day itself) per row
+    days = table["date"].to_numpy(zero_copy_only=False).astype("datetime64[D]")
+    day_idx = (np.datetime64(end_day, "D") - days).astype(np.int64)
+
+    topic_ids, topic_codes = np.unique(
+        table["topic_id"].to_numpy(zero_copy_only=False), return_inverse=True
+    )
+    n_topics = len(topic_ids)
+
+    # latest title per topic (titles can be renamed)
+    newest = np.lexsort((-day_idx, topic_codes))
+    last_of_topic = np.r_[topic_codes[newest][1:] != topic_codes[newest][:-1], True]
+    titles = table["topic_title"].take(pa.array(newest[last_of_topic])).to_pylist()
+
+    sender = table["sender_id"]
+    has_sender = pc.is_valid(sender).to_numpy(zero_copy_only=False)
+    sender_ids = pc.fill_null(sender, 0).to_numpy(zero_copy_only=False)
+    senders = pd.Series(sender.to_pandas(types_mapper=INT64_NULLABLE))
+    usernames = table["sender_username"].to_pandas()
+
+    date_label = end_day.isoformat()
+    parts: List[pa.Table] = []
+    for w in windows:
+        rows: List[dict] = []
+        in_w = day_idx < w
+        in_prev = (day_idx >= w) & (day_idx < 2 * w)
+        counts = np.bincount(
+            topic_codes[in_w], weights=weights[in_w], minlength=n_topics
+        ).astype(np.int64)
+        prev_counts = np.bincount(
+            topic_codes[in_prev], weights=weights[in_prev], minlength=n_topics
+        ).astype(np.int64)
+        known = in_w & has_sender
+        senders_per_topic = np.bincount(
+            _distinct_pairs(topic_codes[known], sender_ids[known]),
+            minlength=n_topics,
+        )
+        rows.append(
+            {
+                "window_days": w,
+                "metric": "active_senders",
+                "active_senders": int(np.unique(sender_ids[known]).size),
+            }
+        )
+        rows.append(
+            {
+                "window_days": w,
+                "metric": "messages_total",
+                "message_count": int(weights[in_w].sum()),
+            }
+        )
+        # topics sorted by messages in the window desc, then topic_id
+        for i in np.lexsort((topic_ids, -counts)):
+            if not counts[i] and not prev_counts[i]:
+                continue
+            rows.append(
+                {
+                    "window_days": w,
+                    "metric": "topic_trend",
+                    "topic_id": int(topic_ids[i]),
+                    "topic_title": titles[i],
+                    "message_count": int(counts[i]),
+                    "prev_message_count": int(prev_counts[i]),
+                    "active_senders": int(senders_per_topic[i]),
+                }
+            )
+        for row in rows:
+            row["date_label_jkt"] = date_label
+        parts.append(pa.Table.from_pylist(rows, schema=ROLLING_SCHEMA))
+
+        contributors = contributors_table(
+            senders[in_w].reset_index(drop=True),
+            usernames[in_w].reset_index(drop=True),
+            weights[in_w],
+        )
+        n = contributors.num_rows
+        parts.append(
+            _with_schema(
+                {
+                    "date_label_jkt": pa.array([date_label] * n, pa.string()),
+                    "window_days": pa.array([w] * n, pa.int64()),
+                    "metric": pa.array(["contributors"] * n, pa.string()),
+                    "message_count": contributors["message_count"],
+                    "sender_id": contributors["sender_id"],
+                    "sender_username": contributors["sender_username"],
+                    "rank_by_messages": contributors["rank_by_messages"],
+                },
+                n,
+            )
+        )
+    report = pa.concat_tables(parts)
+
+    if out_path is None:
+        out_path = dataset_path(
+            out_dir, "rolling_report", end_day.strftime("%Y%m%d"), layout
+        )
+    Path(out_path).parent.mkdir(parents=True, exist_ok=True)
+    pq.write_table(report, out_path)
+    metrics.count_bytes(out_path, "rolling_report")
+    return out_path
@@ -0,0 +1,205 @@
+import os
+import sqlite3
+import sys
+from pathlib import Path
+from typing import List, NamedTuple, Optional
+
+import pyarrow.parquet as pq
+from dotenv import load_dotenv
+
+import metrics
+
+# ====== CONFIG ======
+load_dotenv()
+SEARCH_INDEX_PATH = Path(
+    os.getenv(
+        "SEARCH_INDEX_PATH",
+        str(Path(os.getenv("OUT_DIR", "telegram_dump")) / "search_index.sqlite"),
+    )
+)
+# ====================
+
+# rows read from the messages parquet per batch while indexing
+INDEX_BATCH_ROWS = 50_000
+
+_INDEX_COLUMNS = ["topic_id", "message_id", "sender_username", "text"]
+
+
+class SearchHit(NamedTuple):
+    date: str
+    topic_id: int
+    message_id: int
+    chat_id: int
+    sender_username: Optional[str]
+    snippet: str
+
+
+def _fts_query(query: str) -> str:
+    """
+    Plain words -> FTS5 query: every word must match (quoted, so
+    punctuation is literal); a trailing * keeps prefix matching.
+    """
+    terms = []
+    for word in query.split():
+        prefix = word.endswith("*")
+        word = word.rstrip("*").replace('"', '""')
+        if word:
+            terms.append(f'"{word}"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+
+class SearchIndex:
+    """
+    Full-text index over harvested message text, in one SQLite file.
+    Messages live in a plain table (keyed by chat, topic and message id,
+    indexed by day) and an FTS5 index over their text uses it as external
+    content, so hits come back with a highlighted snippet.
+    A day is indexed as a whole: re-indexing it replaces its rows, so
+    reruns of the same day never duplicate hits.
+    """
+
+    def __init__(self, path: Path = SEARCH_INDEX_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # several processes (multi-chat runs) may share one index file
+        self._conn = sqlite3.connect(str(self.path), timeout=60)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS messages (
+              id INTEGER PRIMARY KEY,
+              date_label TEXT NOT NULL,
+              chat_id INTEGER NOT NULL,
+              topic_id INTEGER,
+              message_id INTEGER NOT NULL,
+              sender_username TEXT,
+              text TEXT,
+              UNIQUE (chat_id, topic_id, message_id)
+            );
+            CREATE INDEX IF NOT EXISTS ix_messages_day
+              ON messages (date_label, chat_id);
+            CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+              text,
+              content='messages',
+              content_rowid='id',
+              tokenize='unicode61 remove_diacritics 2'
+            );
+            """)
+
+    def _delete_day(self, date_label: str, chat_id: int) -> None:
+        # external content: the FTS rows go first, with their old text
+        self._conn.execute(
+            "INSERT INTO messages_fts(messages_fts, rowid, text) "
+            "SELECT 'delete', id, text FROM messages "
+            "WHERE date_label = ? AND chat_id = ?",
+            (date_label, chat_id),
+        )
+        self._conn.execute(
+            "DELETE FROM messages WHERE date_label = ? AND chat_id = ?",
+            (date_label, chat_id),
+        )
+
+    def index_parquet(
+        self, parquet_path: Path, date_label: str, chat_id: Optional[int]
+    ) -> int:
+        """
+        Index (or re-index) one chat's messages parquet of one day, plain
+        or compact. date_label is the Jakarta day, YYYY-MM-DD. The chat's
+        previous rows of that day are dropped first, also when the file
+        has none left.
+        Return: number of messages indexed
+        """
+        # rows without a chat get chat_id 0, as in MySQL
+        chat_id = chat_id or 0
+        pf = pq.ParquetFile(str(parquet_path))
+        columns = [c for c in _INDEX_COLUMNS if c in pf.schema_arrow.names]
+        total = 0
+        with metrics.stage("search_index"), self._conn:
+            self._delete_day(date_label, chat_id)
+            for batch in pf.iter_batches(batch_size=INDEX_BATCH_ROWS, columns=columns):
+                data = {c: batch.column(c).to_pylist() for c in columns}
+                n = batch.num_rows
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO messages (date_label, chat_id, topic_id, "
+                    "message_id, sender_username, text) VALUES (?, ?, ?, ?, ?, ?)",
+                    zip(
+                        [date_label] * n,
+                        [chat_id] * n,
+                        data["topic_id"],
+                        data["message_id"],
+                        data.get("sender_username", [None] * n),
+                        data["text"],
+                    ),
+                )
+                total += n
+            self._conn.execute(
+                "INSERT INTO messages_fts(rowid, text) SELECT id, text "
+                "FROM messages WHERE date_label = ? AND chat_id = ?",
+                (date_label, chat_id),
+            )
+        metrics.count("search_indexed_total", total)
+        return total
+
+    def search(
+        self,
+        query: str,
+        limit: int = 50,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        topic_id: Optional[int] = None,
+        chat_id: Optional[int] = None,
+    ) -> List[SearchHit]:
+        """
+        Messages containing every word of query (word* for a prefix),
+        best match first. since / until are YYYY-MM-DD days, both included.
+        """
+        match = _fts_query(query)
+        if not match:
+            return []
+        sql = (
+            "SELECT m.date_label, m.topic_id, m.message_id, m.chat_id, "
+            "m.sender_username, snippet(messages_fts, 0, '[', ']', '…', 12) "
+            "FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid "
+            "WHERE messages_fts MATCH ?"
+        )
+        params: list = [match]
+        for clause, value in (
+            ("m.date_label >= ?", since),
+            ("m.date_label <= ?", until),
+            ("m.topic_id = ?", topic_id),
+            ("m.chat_id = ?", chat_id),
+        ):
+            if value is not None:
+                sql += f" AND {clause}"
+                params.append(value)
+        sql += " ORDER BY messages_fts.rank LIMIT ?"
+        params.append(int(limit))
+        return [SearchHit(*row) for row in self._conn.execute(sql, params)]
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def main():
+    query = " ".join(sys.argv[1:])
+    if not query:
+        raise SystemExit("[!] Usage: python search.py <words…>")
+    index = SearchIndex(SEARCH_INDEX_PATH)
+    try:
+        hits = index.search(
+            query,
+            limit=int(os.getenv("SEARCH_LIMIT", "50")),
+            since=os.getenv("SEARCH_SINCE") or None,
+            until=os.getenv("SEARCH_UNTIL") or None,
+        )
+    finally:
+        index.close()
+    for hit in hits:
+        print(
+            f"{hit.date} topic {hit.topic_id} #{hit.message_id} "
+            f"@{hit.sender_username or '-'}: {hit.snippet}"
+        )
+    print(f"[i] {len(hits)} hit(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import sqlite3
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+
+class SenderCache:
+    """
+    Persistent sender_id → username cache shared across daily runs.
+    Backed by a SQLite file; entries older than ttl_s are treated as missing
+    so they get refreshed, and the least recently used entries beyond
+    max_size are evicted on save.
+    Behaves like the plain dict used before (in / [] / get / []=).
+    """
+
+    def __init__(self, path: Path, ttl_s: float, max_size: int):
+        self.path = Path(path)
+        self.ttl_s = ttl_s
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._seen = set()
+        self._dirty = set()
+        # sender_id -> (username, resolved_at), ordered from least recently used
+        self._entries: "OrderedDict[int, tuple[Optional[str], float]]" = OrderedDict()
+
+        self._conn = sqlite3.connect(str(self.path))
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sender_cache (
+              sender_id INTEGER PRIMARY KEY,
+              username TEXT,
+              resolved_at REAL,
+              last_used REAL
+            )
+            """
+        )
+        for sender_id, username, resolved_at in self._conn.execute(
+            "SELECT sender_id, username, resolved_at FROM sender_cache "
+            "ORDER BY last_used ASC"
+        ):
+            self._entries[sender_id] = (username, resolved_at)
+
+    def _fresh(self, sender_id) -> bool:
+        entry = self._entries.get(sender_id)
+        return entry is not None and time.time() - entry[1] < self.ttl_s
+
+    def __contains__(self, sender_id) -> bool:
+        fresh = self._fresh(sender_id)
+        if sender_id not in self._seen:
+            # count each sender once per run
+            self._seen.add(sender_id)
+            if fresh:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if fresh:
+            self._entries.move_to_end(sender_id)
+            self._dirty.add(sender_id)
+        return fresh
+
+    def __getitem__(self, sender_id) -> Optional[str]:
+        if not self._fresh(sender_id):
+            raise KeyError(sender_id)
+        return self._entries[sender_id][0]
+
+    def get(self, sender_id, default=None) -> Optional[str]:
+        try:
+            return self[sender_id]
+        except KeyError:
+            return default
+
+    def __setitem__(self, sender_id, username: Optional[str]) -> None:
+        self._entries[sender_id] = (username, time.time())
+        self._entries.move_to_end(sender_id)
+        self._dirty.add(sender_id)
+        while len(self._entries) > self.max_size:
+            evicted, _ = self._entries.popitem(last=False)
+            self._dirty.discard(evicted)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def save(self) -> None:
+        """
+        Write touched entries back and trim the file to max_size (LRU).
+        """
+        now = time.time()
+        rows = [
+            (sender_id, *self._entries[sender_id], now)
+            for sender_id in self._dirty
+            if sender_id in self._entries
+        ]
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO sender_cache "
+                "(sender_id, username, resolved_at, last_used) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.execute(
+                "DELETE FROM sender_cache WHERE sender_id NOT IN ("
+                "SELECT sender_id FROM sender_cache ORDER BY last_used DESC LIMIT ?)",
+                (self.max_size,),
+            )
+        self._dirty.clear()
+
+    def close(self) -> None:
+        try:
+            self.save()
+        finally:
+            self._conn.close()
+
+    def stats_line(self) -> str:
+        total = self.hits + self.misses
+        rate = (self.hits / total * 100) if total else 0.0
+        return (
+            f"sender cache hits: {self.hits} | misses: {self.misses} "
+            f"| hit rate: {rate:.1f}% | size: {len(self)}"
+        )
@@ -0,0 +1,30 @@
+from pathlib import Path
+
+# "flat": telegram_dump/yesterday_<kind>_YYYYMMDD.parquet (original layout)
+# "hive": telegram_dump/<kind>/date=YYYY-MM-DD/part-0.parquet (prunable dataset)
+LAYOUTS = ("flat", "hive")
+
+# kinds of daily outputs
+KINDS = (
+    "all_topics",
+    "report",
+    "report_state",
+    "member_count",
+    "rolling_report",
+    "threads",
+)
+
+
+def dataset_path(out_dir: Path, kind: str, yday_str: str, layout: str = "flat") -> Path:
+    """
+    Path of one day's output file. yday_str is the YYYYMMDD Jakarta label.
+    Nothing is created: writers make the parent directory of what they write.
+    """
+    if kind not in KINDS:
+        raise ValueError(f"Unknown output kind {kind!r}, use one of {KINDS}")
+    if layout == "flat":
+        return Path(out_dir) / f"yesterday_{kind}_{yday_str}.parquet"
+    if layout == "hive":
+        date_iso = f"{yday_str[:4]}-{yday_str[4:6]}-{yday_str[6:]}"
+        return Path(out_dir) / kind / f"date={date_iso}" / "part-0.parquet"
+    raise ValueError(f"Unknown layout {layout!r}, use one of {LAYOUTS}")
@@ -0,0 +1,176 @@
+from __future__ import annotations
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+# message columns the thread graph needs (besides topic_id)
+THREAD_INPUT_COLS = ["message_id", "date_utc", "reply_to_msg_id"]
+
+# per-topic thread metrics, as report rows (metric, value)
+THREAD_METRICS = (
+    "thread_count",
+    "reply_count",
+    "max_thread_size",
+    "max_thread_depth",
+    "median_first_reply_s",
+)
+
+# one row per message: where it sits in its reply thread
+THREAD_SCHEMA = pa.schema(
+    [
+        ("date_label_jkt", pa.string()),
+        ("topic_id", pa.int64()),
+        ("message_id", pa.int64()),
+        ("parent_message_id", pa.int64()),
+        ("root_message_id", pa.int64()),
+        ("depth", pa.int64()),
+        ("thread_size", pa.int64()),
+    ]
+)
+
+
+class ThreadGraph(NamedTuple):
+    """
+    Reply graph of one day, rows sorted by (topic_id, message_id).
+    parent / root are row numbers in that order (parent -1 for roots).
+    """
+
+    order: np.ndarray
+    topic_id: np.ndarray
+    message_id: np.ndarray
+    parent: np.ndarray
+    root: np.ndarray
+    depth: np.ndarray
+
+
+def _parent_rows(
+    topic_id: np.ndarray, message_id: np.ndarray, reply_to: np.ndarray
+) -> np.ndarray:
+    """
+    Row of the message each (sorted) row replies to, -1 for a thread root:
+    a post to the topic itself (reply_to null or == topic_id) or a reply to
+    a message outside the data (earlier day).
+    """
+    n = len(message_id)
+    # (topic, message) packed in one sortable key: ids are 32-bit
+    topic_codes = np.unique(topic_id, return_inverse=True)[1].astype(np.int64)
+    keys = (topic_codes << 32) | message_id
+    is_reply = ~np.isnan(reply_to) & (reply_to != topic_id)
+    parent_ids = np.where(is_reply, reply_to, 0).astype(np.int64)
+    pos = np.searchsorted(keys, (topic_codes << 32) | parent_ids)
+    found = is_reply & (pos < np.arange(n))
+    found[found] &= keys[pos[found]] == ((topic_codes << 32) | parent_ids)[found]
+    return np.where(found, pos, -1)
+
+
+def _resolve_roots(parent: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Thread root and depth of every row by pointer jumping: each pass
+    doubles how far every row has climbed, so it takes log2(max depth)
+    vectorized passes.
+    Return: (root row, depth) per row
+    """
+    rows = np.arange(len(parent))
+    ancestor = np.where(parent >= 0, parent, rows)
+    depth = (parent >= 0).astype(np.int64)
+    while True:
+        next_ancestor = ancestor[ancestor]
+        if np.array_equal(next_ancestor, ancestor):
+            return ancestor, depth
+        depth = depth + depth[ancestor]
+        ancestor = next_ancestor
+
+
+def build_thread_graph(
+    topic_id: pd.Series, message_id: pd.Series, reply_to_msg_id: pd.Series
+) -> ThreadGraph:
+    """
+    Array-backed reply graph of one day's messages: one sort, then
+    vectorized lookups, with no self-join on the messages.
+    """
+    topic = topic_id.to_numpy(dtype=np.int64, na_value=0)
+    message = message_id.to_numpy(dtype=np.int64)
+    order = np.lexsort((message, topic))
+    topic, message = topic[order], message[order]
+    reply_to = reply_to_msg_id.to_numpy(dtype=np.float64, na_value=np.nan)[order]
+    parent = _parent_rows(topic, message, reply_to)
+    root, depth = _resolve_roots(parent)
+    return ThreadGraph(order, topic, message, parent, root, depth)
+
+
+def _epoch_seconds(date_utc: pd.Series) -> np.ndarray:
+    # ISO strings (plain parquet) or timestamps (compact parquet)
+    ts = pd.to_datetime(date_utc, utc=True, format="ISO8601")
+    return ((ts - pd.Timestamp(0, tz="UTC")) // pd.Timedelta(seconds=1)).to_numpy(
+        dtype=np.int64
+    )
+
+
+def thread_stats(graph: ThreadGraph, date_utc: pd.Series) -> pd.DataFrame:
+    """
+    Per topic: threads (roots with at least one reply), replies, size of
+    the largest thread, deepest reply chain and the median seconds from a
+    thread's root to its first reply.
+    Return: DataFrame of topic_id + THREAD_METRICS, sorted by topic_id
+    """
+    n = len(graph.parent)
+    seconds = _epoch_seconds(date_utc)[graph.order]
+    is_root = graph.parent < 0
+    size = np.bincount(graph.root, minlength=n)
+    replied_root = is_root & (size > 1)
+
+    topics, starts = np.unique(graph.topic_id, return_index=True)
+    topic_codes = np.repeat(np.arange(len(topics)), np.diff(np.r_[starts, n]))
+
+    # first reply to every message that got one
+    first_reply = np.full(n, np.iinfo(np.int64).max)
+    replies = graph.parent >= 0
+    np.minimum.at(first_reply, graph.parent[replies], seconds[replies])
+    delays = pd.Series(
+        first_reply[replied_root] - seconds[replied_root],
+        index=topic_codes[replied_root],
+    )
+    median_delay = delays.groupby(level=0).median().round()
+
+    return pd.DataFrame(
+        {
+            "topic_id": topics,
+            "thread_count": np.bincount(
+                topic_codes[replied_root], minlength=len(topics)
+            ),
+            "reply_count": np.bincount(topic_codes[replies], minlength=len(topics)),
+            "max_thread_size": np.maximum.reduceat(np.where(is_root, size, 0), starts),
+            "max_thread_depth": np.maximum.reduceat(graph.depth, starts),
+            "median_first_reply_s": pd.array(
+                median_delay.reindex(range(len(topics))).to_numpy(), dtype="Int64"
+            ),
+        }
+    )
+
+
+def thread_table(graph: ThreadGraph, date_label_jkt: str) -> pa.Table:
+    """
+    The materialized graph: parent, root, depth and thread size of every
+    message (THREAD_SCHEMA), sorted by (topic_id, message_id).
+    """
+    n = len(graph.parent)
+    has_parent = graph.parent >= 0
+    size = np.bincount(graph.root, minlength=n)
+    return pa.Table.from_arrays(
+        [
+            pa.array([date_label_jkt] * n, pa.string()),
+            pa.array(graph.topic_id, pa.int64()),
+            pa.array(graph.message_id, pa.int64()),
+            pa.array(
+                graph.message_id[np.where(has_parent, graph.parent, 0)],
+                pa.int64(),
+                mask=~has_parent,
+            ),
+            pa.array(graph.message_id[graph.root], pa.int64()),
+            pa.array(graph.depth, pa.int64()),
+            pa.array(size[graph.root], pa.int64()),
+        ],
+        schema=THREAD_SCHEMA,
+    )
@@ -1,61 +1,217 @@
 import asyncio
+import math
 from datetime import datetime, timezone
-from typing import AsyncGenerator, Dict, List
+from typing import AsyncGenerator, Dict, Iterable, List, Optional, Tuple
 
-from telethon.errors.rpcerrorlist import FloodWaitError
-from telethon.tl.functions.channels import GetForumTopicsRequest
+from telethon.tl.functions.channels import GetChannelsRequest, GetForumTopicsRequest
+from telethon.tl.functions.users import GetUsersRequest
+from telethon.tl.types import InputChannel, InputUser
 
+import metrics
+from ratelimit import get_limiter
 
-async def fetch_all_topics(client, chat) -> List:
+# max ids per users.GetUsers / channels.GetChannels call
+RESOLVE_BATCH_SIZE = 100
+
+# messages per history page (one RPC each; Telegram's maximum)
+PAGE_SIZE = 100
+# smallest page requested when the topic's rate says few messages are left
+MIN_PAGE_SIZE = 20
+
+
+async def fetch_all_topics_with_activity(
+    client, chat
+) -> Tuple[List, Dict[int, datetime]]:
     """
     Paging through all topics in a forum chat.
+    Also return the last-activity date per topic, taken from the topic's
+    top_message in the response's messages list.
     """
+    with metrics.stage("list_topics"):
+        topics, last_activity = await _page_topics(client, chat)
+    metrics.set_gauge("topics", len(topics))
+    return topics, last_activity
+
+
+async def _page_topics(client, chat) -> Tuple[List, Dict[int, datetime]]:
+    limiter = get_limiter(client)
     topics, seen = [], set()
+    last_activity: Dict[int, datetime] = {}
     offset_date, offset_id, offset_topic = None, 0, 0
     while True:
-        try:
-            res = await client(
-                GetForumTopicsRequest(
-                    channel=chat,
-                    offset_date=offset_date,
-                    offset_id=offset_id,
-                    offset_topic=offset_topic,
-                    limit=100,
-                )
-            )
-        except FloodWaitError as e:
-            await asyncio.sleep(e.seconds + 1)
-            continue
+        res = await limiter.call(
+            client,
+            GetForumTopicsRequest(
+                channel=chat,
+                offset_date=offset_date,
+                offset_id=offset_id,
+                offset_topic=offset_topic,
+                limit=100,
+            ),
+        )
 
         if not res.topics:
             break
 
+        top_dates = {
+            m.id: m.date
+            for m in getattr(res, "messages", [])
+            # MessageEmpty (e.g. a deleted top message) has no date
+            if getattr(m, "date", None) is not None
+        }
         for t in res.topics:
             if t.id not in seen:
                 seen.add(t.id)
                 topics.append(t)
+                top_dt = top_dates.get(getattr(t, "top_message", None))
+                if top_dt is not None:
+                    if top_dt.tzinfo is None:
+                        top_dt = top_dt.replace(tzinfo=timezone.utc)
+                    last_activity[t.id] = top_dt
 
         last = res.topics[-1]
         offset_topic, offset_id, offset_date = last.id, 0, None
         if len(res.topics) < 100:
             break
+    return topics, last_activity
+
+
+async def fetch_all_topics(client, chat) -> List:
+    """
+    Paging through all topics in a forum chat.
+    """
+    topics, _ = await fetch_all_topics_with_activity(client, chat)
     return topics
 
 
+def filter_active_topics(
+    topics: List, last_activity: Dict[int, datetime], since_utc: datetime
+) -> List:
+    """
+    Drop dormant topics whose latest message is older than since_utc.
+    Topics without a known last-activity date are kept.
+    """
+    return [
+        t
+        for t in topics
+        if t.id not in last_activity or last_activity[t.id] >= since_utc
+    ]
+
+
+def _utc(dt: datetime) -> datetime:
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt
+
+
+def _remaining_estimate(n_seen: int, newest, oldest, until_utc: datetime) -> float:
+    """
+    Messages left between oldest and until_utc at the rate observed so far
+    (n_seen messages from newest down to oldest).
+    """
+    span = (newest - oldest).total_seconds()
+    if span <= 0:
+        return math.inf
+    return n_seen / span * (oldest - until_utc).total_seconds()
+
+
+def _next_page_size(left: float) -> int:
+    # room for the estimate to be off, so a last page rarely needs a follow-up
+    if left >= PAGE_SIZE:
+        return PAGE_SIZE
+    return min(PAGE_SIZE, max(MIN_PAGE_SIZE, math.ceil(left * 1.5)))
+
+
+async def iter_topic_pages(
+    client,
+    chat,
+    topic_id: int,
+    offset_date: Optional[datetime] = None,
+    min_id: int = 0,
+    offset_id: int = 0,
+    until_utc: Optional[datetime] = None,
+    prefetch: bool = True,
+) -> AsyncGenerator:
+    """
+    Iterate through messages in a topic, newest first, one page (a single
+    RPC) at a time through the client's rate limiter. A FloodWait retries
+    the same page, so iteration resumes from the last offset_id instead of
+    dropping the rest of the topic. A non-zero offset_id starts below that
+    message (checkpoint resume) instead of at offset_date.
+    With prefetch, the next page is requested before the current one is
+    yielded, so its round trip overlaps the caller's work.
+    until_utc is the lower date edge of the wanted window (the caller
+    stops there): no page is requested once a page reaches below it, and
+    the last one is sized from the topic's message rate seen so far, so
+    little of it falls outside the window.
+    Return: AsyncGenerator of Message
+    """
+    limiter = get_limiter(client)
+
+    async def _page(offset_id: int, limit: int) -> list:
+        page = await limiter.call(
+            client.get_messages,
+            chat,
+            limit=limit,
+            reply_to=topic_id,
+            offset_id=offset_id,
+            offset_date=None if offset_id else offset_date,
+            min_id=min_id,
+        )
+        metrics.count("messages_fetched_total", len(page))
+        return page
+
+    limit, n_seen, newest = PAGE_SIZE, 0, None
+    pending = asyncio.ensure_future(_page(offset_id, limit))
+    try:
+        while True:
+            page, pending = await pending, None
+            more = len(page) >= limit
+            limit = PAGE_SIZE
+            if more and until_utc is not None:
+                n_seen += len(page)
+                newest = newest or _utc(page[0].date)
+                oldest = _utc(page[-1].date)
+                more = oldest >= until_utc
+                limit = _next_page_size(
+                    _remaining_estimate(n_seen, newest, oldest, until_utc)
+                )
+            if more:
+                offset_id = page[-1].id
+                if prefetch:
+                    pending = asyncio.ensure_future(_page(offset_id, limit))
+            for msg in page:
+                yield msg
+            if not more:
+                return
+            if pending is None:
+                pending = asyncio.ensure_future(_page(offset_id, limit))
+    finally:
+        # iteration stopped early: the prefetched page is not needed
+        if pending is not None:
+            pending.cancel()
+            if pending.done() and not pending.cancelled():
+                pending.exception()
+
+
 async def iter_topic_messages_yesterday(
     client,
     chat,
     topic_id: int,
     start_yday_utc: datetime,
     start_today_utc: datetime,
+    offset_id: int = 0,
 ) -> AsyncGenerator:
     """
     Iterate through messages in a topic, from yesterday to today.
+    A non-zero offset_id resumes below that message.
     Return: AsyncGenerator of Message
     """
-    count = 0
-    async for msg in client.iter_messages(
-        chat, reply_to=topic_id, offset_date=start_today_utc
+    async for msg in iter_topic_pages(
+        client,
+        chat,
+        topic_id,
+        offset_date=start_today_utc,
+        offset_id=offset_id,
+        until_utc=start_yday_utc,
     ):
         msg_dt = msg.date
         if msg_dt.tzinfo is None:
@@ -67,9 +223,38 @@ async def iter_topic_messages_yesterday(
             continue
 
         yield msg
-        count += 1
-        if count % 200 == 0:
-            await asyncio.sleep(0.5)
+
+
+async def iter_topic_messages_since(
+    client,
+    chat,
+    topic_id: int,
+    min_id: int,
+    start_utc: datetime,
+    offset_id: int = 0,
+) -> AsyncGenerator:
+    """
+    Iterate through messages in a topic newer than min_id (the high-water mark).
+    Without a mark (min_id=0), go back until start_utc.
+    A non-zero offset_id resumes below that message.
+    Return: AsyncGenerator of Message, newest first
+    """
+    async for msg in iter_topic_pages(
+        client,
+        chat,
+        topic_id,
+        min_id=min_id,
+        offset_id=offset_id,
+        until_utc=None if min_id else start_utc,
+    ):
+        if not min_id:
+            msg_dt = msg.date
+            if msg_dt.tzinfo is None:
+                msg_dt = msg_dt.replace(tzinfo=timezone.utc)
+            if msg_dt < start_utc:
+                break
+
+        yield msg
 
 
 async def resolve_username(client, sender_id, cache: Dict[int, str]):
@@ -81,7 +266,7 @@ async def resolve_username(client, sender_id, cache: Dict[int, str]):
     if sender_id in cache:
         return cache[sender_id]
     try:
-        ent = await client.get_entity(sender_id)
+        ent = await get_limiter(client).call(client.get_entity, sender_id)
     except Exception:
         cache[sender_id] = None
         return None
@@ -89,3 +274,74 @@ async def resolve_username(client, sender_id, cache: Dict[int, str]):
     username = getattr(ent, "username", None)
     cache[sender_id] = username
     return username
+
+
+def username_from_message(msg, cache: Dict[int, str]) -> bool:
+    """
+    Take the sender entity Telethon already attached from the response's
+    users/chats and store its username in cache. Return True if known.
+    """
+    sender_id = getattr(msg, "sender_id", None)
+    if sender_id is None:
+        return True
+    if sender_id in cache:
+        return True
+    sender = getattr(msg, "sender", None)
+    if sender is None:
+        return False
+    cache[sender_id] = getattr(sender, "username", None)
+    return True
+
+
+async def resolve_usernames_bulk(
+    client, sender_ids: Iterable[int], cache: Dict[int, str]
+) -> None:
+    """
+    Resolve unknown sender_ids in bulk (users.GetUsers / channels.GetChannels)
+    and fill cache. Ids the server answers without a username are cached
+    as None; ids whose lookup failed (network / RPC errors, peers without
+    an access hash) are left out, so a later call retries them.
+    """
+    with metrics.stage("resolve_usernames"):
+        await _resolve_usernames_bulk(client, sender_ids, cache)
+
+
+async def _resolve_usernames_bulk(
+    client, sender_ids: Iterable[int], cache: Dict[int, str]
+) -> None:
+    limiter = get_limiter(client)
+    users, channels = [], []
+    for sender_id in dict.fromkeys(sender_ids):
+        if sender_id is None or sender_id in cache:
+            continue
+        try:
+            peer = await client.get_input_entity(sender_id)
+        except Exception:
+            continue
+        # InputPeerSelf / InputPeerUserFromMessage carry no access hash
+        access_hash = getattr(peer, "access_hash", None)
+        if access_hash is None:
+            continue
+        if hasattr(peer, "user_id"):
+            users.append((sender_id, InputUser(peer.user_id, access_hash)))
+        elif hasattr(peer, "channel_id"):
+            channels.append((sender_id, InputChannel(peer.channel_id, access_hash)))
+
+    for pending, make_request in (
+        (users, lambda ids: GetUsersRequest(id=ids)),
+        (channels, lambda ids: GetChannelsRequest(id=ids)),
+    ):
+        for i in range(0, len(pending), RESOLVE_BATCH_SIZE):
+            chunk = pending[i : i + RESOLVE_BATCH_SIZE]
+            try:
+                res = await limiter.call(client, make_request([p for _, p in chunk]))
+            except Exception as e:
+                print(f"[!] {len(chunk)} sender(s) not resolved, retried later: {e}")
+                continue
+            entities = getattr(res, "chats", res)
+            by_id = {ent.id: ent for ent in entities}
+            for sender_id, p in chunk:
+                raw_id = getattr(p, "user_id", None) or getattr(p, "channel_id", None)
+                ent = by_id.get(raw_id)
+                cache[sender_id] = getattr(ent, "username", None)
+            metrics.count("usernames_resolved_total", len(chunk))
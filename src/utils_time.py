@@ -1,5 +1,5 @@
-from datetime import datetime, timedelta, timezone
-from typing import Tuple
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Tuple
 
 JKT_OFFSET = timedelta(hours=7)
 
@@ -18,3 +18,26 @@ def jakarta_bounds_yesterday_utc(now_utc: datetime) -> Tuple[datetime, datetime]
 def yday_label_str(now_utc: datetime) -> str:
     """lablel for 'yesterday' in Jakarta time, formatted as YYYYMMDD"""
     return (now_utc + JKT_OFFSET - timedelta(days=1)).date().strftime("%Y%m%d")
+
+
+def jakarta_day_bounds_utc(day: date) -> Tuple[datetime, datetime]:
+    """
+    get start and end of a Jakarta calendar day (WIB, UTC+7) in UTC.
+    """
+    start_jkt_naive = datetime(day.year, day.month, day.day)
+    start_utc = (start_jkt_naive - JKT_OFFSET).replace(tzinfo=timezone.utc)
+    return start_utc, start_utc + timedelta(days=1)
+
+
+def day_label_str(day: date) -> str:
+    """label for a Jakarta day, formatted as YYYYMMDD"""
+    return day.strftime("%Y%m%d")
+
+
+def jakarta_days(first: date, last: date) -> List[date]:
+    """
+    every Jakarta day from first to last, both included.
+    """
+    if last < first:
+        raise ValueError(f"Empty date range: {first} > {last}")
+    return [first + timedelta(days=i) for i in range((last - first).days + 1)]